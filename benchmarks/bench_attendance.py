@@ -0,0 +1,92 @@
+"""Check-in throughput through AttendanceBuffer, and rollup vs. raw-log queries.
+
+Usage: python benchmarks/bench_attendance.py [members] [events]
+
+Simulates a year of check-ins clustered around morning and evening peaks,
+then times "visits this month" for one member and the peak-hour profile
+of the last 30 days, answered from the rollups and from the raw log.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+from bench_connections import populate
+
+PEAK_HOURS = [7, 8, 9, 17, 18, 19, 20]
+
+
+def checkin_times(events, seed=0):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=365)
+    for i in range(events):
+        day = start + timedelta(days=i * 365 // events)
+        hour = rng.choice(PEAK_HOURS) if rng.random() < 0.7 else rng.randrange(6, 23)
+        yield day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+
+
+def timed_ms(func, repeat=50):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2], result
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    events = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        repository = gym_core.UserRepository(db_name)
+        gym_core.set_repository(repository)
+        gym_core.init_db()
+        populate(db_name, members)
+        # Every synthetic member may check in, whatever their subscription says
+        with repository.transaction() as conn:
+            conn.execute('UPDATE users SET active = 1, expiration_ts = ?', (2 ** 40,))
+
+        rng = random.Random(1)
+        buffer = gym_core.AttendanceBuffer(repository, max_events=2000)
+        start = time.perf_counter()
+        for when in checkin_times(events):
+            buffer.check_in(rng.randint(1, members), when)
+        buffer.close()
+        elapsed = time.perf_counter() - start
+        print(f"{events} check-ins in {elapsed:.1f} s ({events / elapsed:.0f}/s, "
+              f"{elapsed / events * 1e6:.1f} us each including the membership check)")
+
+        conn = repository.connection()
+        user_id = rng.randint(1, members)
+        today = datetime.now().toordinal()
+        first_day, last_day = gym_core.jalali_month_days(today)
+        rollup_ms, rollup = timed_ms(lambda: gym_core.member_visits(user_id, first_day, last_day))
+        raw_ms, raw = timed_ms(lambda: conn.execute(
+            'SELECT COUNT(*) FROM attendance WHERE user_id = ? AND day BETWEEN ? AND ?',
+            (user_id, first_day, last_day)).fetchone()[0])
+        assert rollup == raw
+        print(f"visits this month      rollup {rollup_ms:8.3f} ms   raw log {raw_ms:8.3f} ms")
+
+        rollup_ms, rollup = timed_ms(lambda: gym_core.hourly_visits(today - 29, today))
+        raw_ms, raw = timed_ms(lambda: conn.execute(
+            'SELECT hour, COUNT(*) FROM attendance WHERE day BETWEEN ? AND ? GROUP BY hour',
+            (today - 29, today)).fetchall(), repeat=10)
+        assert sum(rollup) == sum(count for _, count in raw)
+        print(f"peak hours, 30 days    rollup {rollup_ms:8.3f} ms   raw log {raw_ms:8.3f} ms")
+
+        rollup_ms, _ = timed_ms(lambda: gym_core.hourly_visits(today - 364, today), repeat=10)
+        raw_ms, _ = timed_ms(lambda: conn.execute(
+            'SELECT hour, COUNT(*) FROM attendance WHERE day BETWEEN ? AND ? GROUP BY hour',
+            (today - 364, today)).fetchall(), repeat=3)
+        print(f"peak hours, 365 days   rollup {rollup_ms:8.3f} ms   raw log {raw_ms:8.3f} ms")
+        repository.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Front-desk latency while gym_backup snapshots a large database.
+
+Usage: python benchmarks/bench_backup.py [members]
+
+Copies a cached synthetic gym into a temporary directory, then measures
+the latency of profile lookups and renewals on the main thread while a
+backup runs on another thread: once copying every page in a single step,
+once in gym_backup's throttled page steps. Each snapshot is then checked
+with PRAGMA integrity_check, and the last one is restored to check that the
+change feed tells open desks to reload.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import gym_backup
+import gym_core
+import gym_perf
+from datasets import dataset_path
+
+
+def desk_latency(repository, members, running):
+    """Alternate lookups and renewals until running is cleared; returns the latency histogram."""
+    rng = random.Random(0)
+    histogram = gym_perf.LatencyHistogram()
+    while running.is_set():
+        start = time.perf_counter()
+        if rng.random() < 0.8:
+            repository.get_user_by_id(rng.randint(1, members))
+        else:
+            repository.renew_subscription(rng.randint(1, members))
+        histogram.record(time.perf_counter() - start)
+        time.sleep(0.002)
+    return histogram
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'gym_management.db')
+        shutil.copy(dataset_path(os.path.join(HERE, 'data'), members), db_name)
+        repository = gym_core.UserRepository(db_name)
+        gym_core.set_repository(repository)
+        gym_core.init_db()
+        size_mb = os.path.getsize(db_name) / 1e6
+        print(f"{members} members, {size_mb:.0f} MB")
+
+        for label, pages, pause in (("single step", -1, 0), ("throttled steps", gym_backup.BACKUP_PAGES,
+                                                             gym_backup.BACKUP_PAUSE)):
+            running = threading.Event()
+            running.set()
+            result = {}
+
+            def backup():
+                start = time.perf_counter()
+                result['path'] = gym_backup.backup_database(db_name, os.path.join(tmp, 'backups'), pages=pages,
+                                                            pause=pause)
+                result['seconds'] = time.perf_counter() - start
+                running.clear()
+
+            thread = threading.Thread(target=backup)
+            thread.start()
+            histogram = desk_latency(repository, members, running)
+            thread.join()
+            summary = histogram.summary()
+            print(f"{label:<16} backup {result['seconds']:5.1f} s   desk ops {summary['count']:6d}  "
+                  f"mean {summary['mean_ms']:6.2f} ms  p95 <= {histogram.percentile(0.95):5.1f} ms  "
+                  f"max {summary['max_ms']:7.1f} ms   integrity {gym_backup.check_database(result['path']) or 'ok'}")
+
+        # Restoring the first snapshot must make a desk that saw the newest
+        # change reload, even after the next write
+        seen = repository.latest_change()
+        start = time.perf_counter()
+        gym_backup.restore_database(result['path'], db_name, os.path.join(tmp, 'backups'))
+        elapsed = time.perf_counter() - start
+        repository.renew_subscription(1)
+        assert repository.latest_change() > seen, "change feed went backwards after a restore"
+        assert repository.get_changes_since(seen) is None, "a desk would not reload after a restore"
+        print(f"restore {elapsed:5.1f} s   change feed {seen} -> {repository.latest_change()}, desks reload")
+        repository.close()
+
+
+if __name__ == '__main__':
+    main()
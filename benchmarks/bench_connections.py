@@ -0,0 +1,86 @@
+"""Per-call latency of the data layer: one connection per call vs. UserRepository.
+
+Usage: python benchmarks/bench_connections.py [members] [calls]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+
+
+def populate(db_name, members):
+    conn = sqlite3.connect(db_name)
+    now = datetime.now()
+
+    def row(i):
+        registration = now - timedelta(days=i % 400)
+        expiration = registration + timedelta(days=30)
+        return (f"member {i}", f"0912{i:07d}", 'vip' if i % 5 == 0 else 'normal', i % 2, i % 3 == 0, i % 7 == 0,
+                registration.isoformat(), expiration.isoformat(), 1,
+                gym_core.to_epoch(registration), gym_core.to_epoch(expiration))
+
+    conn.executemany('''
+        INSERT INTO users (name, phone, program_type, diet, training, coach, registration_date, expiration_date, active,
+                           registration_ts, expiration_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (row(i) for i in range(members)))
+    conn.commit()
+    conn.close()
+
+
+def per_call_stats(db_name):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM users')
+    total_users = cursor.fetchone()[0]
+    cursor.execute('SELECT COUNT(*) FROM users WHERE active=1')
+    active_users = cursor.fetchone()[0]
+    cursor.execute('SELECT COUNT(*) FROM users WHERE active=0')
+    inactive_users = cursor.fetchone()[0]
+    conn.close()
+    return total_users, active_users, inactive_users
+
+
+def per_call_get_user_by_id(db_name, user_id):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM users WHERE id=?', (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    return user
+
+
+def measure(label, func, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed / calls * 1e6:10.1f} us/call")
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        gym_core.set_repository(gym_core.UserRepository(db_name))
+        gym_core.init_db()
+        populate(db_name, members)
+        print(f"{members} members, {calls} calls each")
+
+        measure("get_user_by_id (connect per call)", lambda i: per_call_get_user_by_id(db_name, i % members + 1), calls)
+        measure("get_user_by_id (repository)", lambda i: gym_core.get_user_by_id(i % members + 1), calls)
+        stats_calls = max(1, calls // 20)
+        measure("get_user_stats (connect per call)", lambda i: per_call_stats(db_name), stats_calls)
+        measure("get_user_stats (repository)", lambda i: gym_core.get_user_stats(), stats_calls)
+        gym_core.get_repository().close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Gregorian -> Jalali conversion: per-row jdatetime vs. memoized vs. the shared batch table.
+
+Usage: python benchmarks/bench_jalali.py [rows] [distinct_days]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+from jdatetime import datetime as jdatetime
+
+
+def per_row(iso_date):
+    dt = datetime.fromisoformat(iso_date)
+    jdt = jdatetime.fromgregorian(datetime=dt)
+    return jdt.strftime('%Y/%m/%d')
+
+
+def measure(label, func, rows):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {elapsed / rows * 1e6:7.2f} us/row")
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    distinct_days = int(sys.argv[2]) if len(sys.argv) > 2 else 730
+    random.seed(1)
+    now = datetime.now()
+    iso_dates = [
+        (now + timedelta(days=random.randrange(distinct_days) - distinct_days // 2,
+                         seconds=random.randrange(86400))).isoformat()
+        for _ in range(rows)
+    ]
+    print(f"{rows} rows over {distinct_days} distinct days")
+    expected = measure("per-row jdatetime", lambda: [per_row(d) for d in iso_dates], rows)
+    gym_core._jalali_day.cache_clear()
+    memoized = measure("to_jalali (cold cache)", lambda: [gym_core.to_jalali(d) for d in iso_dates], rows)
+    measure("to_jalali (warm cache)", lambda: [gym_core.to_jalali(d) for d in iso_dates], rows)
+    batch = measure("to_jalali_batch", lambda: gym_core.to_jalali_batch(iso_dates), rows)
+    # The table persists across calls, so model pages reuse it instead of rebuilding it
+    pages = [iso_dates[start:start + gym_core.PAGE_SIZE] for start in range(0, rows, gym_core.PAGE_SIZE)]
+    paged = measure(f"to_jalali_batch, {gym_core.PAGE_SIZE}-row pages",
+                    lambda: [jalali for page in pages for jalali in gym_core.to_jalali_batch(page)], rows)
+    assert expected == memoized == batch == paged
+
+
+if __name__ == '__main__':
+    main()
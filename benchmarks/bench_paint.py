@@ -0,0 +1,97 @@
+"""Paint time of the members table while scrolling, cached vs. per-paint checkbox glyphs.
+
+Usage: python benchmarks/bench_paint.py [members] [frames]
+
+Renders offscreen. Run with QT_SCALE_FACTOR=2 to measure a high-DPI screen.
+"""
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QColor, QFont
+from PyQt5.QtWidgets import QApplication, QStyledItemDelegate, QStyleOptionViewItem
+from PyQt5.QtCore import Qt
+
+import gym
+import gym_core
+from bench_connections import populate
+
+
+class PerPaintCheckBoxDelegate(QStyledItemDelegate):
+    """The delegate as it was before glyph caching: font setup and text layout on every paint."""
+
+    def paint(self, painter, option, index):
+        value = index.data(Qt.DisplayRole)
+        if value is not None:
+            opt = QStyleOptionViewItem(option)
+            self.initStyleOption(opt, index)
+            checkbox_size = 32
+            x = opt.rect.x() + (opt.rect.width() - checkbox_size) // 2
+            y = opt.rect.y() + (opt.rect.height() - checkbox_size) // 2
+            painter.save()
+            painter.setPen(QColor("green" if value else "red"))
+            painter.setFont(QFont("Arial", 28, QFont.Bold))
+            painter.drawText(x, y + checkbox_size - 5, "✓" if value else "✗")
+            painter.restore()
+
+
+def scroll_frames(app, widget, frames):
+    """Scroll one page per frame and repaint the viewport; returns per-frame milliseconds."""
+    table = widget.table
+    scrollbar = table.verticalScrollBar()
+    scrollbar.setValue(0)
+    app.processEvents()
+    samples = []
+    for _ in range(frames):
+        if scrollbar.value() >= scrollbar.maximum():
+            scrollbar.setValue(0)
+        else:
+            scrollbar.setValue(scrollbar.value() + scrollbar.pageStep())
+        start = time.perf_counter()
+        table.viewport().grab()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    median = samples[len(samples) // 2]
+    print(f"{label:<22} median {median:7.2f} ms/frame  p95 {samples[int(len(samples) * 0.95)]:7.2f} ms"
+          f"  ~{1000 / median:6.0f} fps")
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    app = QApplication.instance() or QApplication([])
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        gym_core.set_repository(gym_core.UserRepository(db_name))
+        gym_core.init_db()
+        populate(db_name, members)
+
+        widget = gym.UsersManagementWidget()
+        widget.resize(1600, 1000)
+        widget.show()
+        app.processEvents()
+        while widget.model.canFetchMore():
+            widget.model.fetchMore()
+        print(f"{widget.model.rowCount()} rows, device pixel ratio {widget.devicePixelRatioF()}")
+
+        cached = widget.table.itemDelegateForColumn(4)
+        per_paint = PerPaintCheckBoxDelegate(widget.table)
+        for label, delegate in (("per-paint glyphs", per_paint), ("cached glyph pixmaps", cached)):
+            for col in [4, 5, 6, 7]:
+                widget.table.setItemDelegateForColumn(col, delegate)
+            scroll_frames(app, widget, 10)
+            report(label, scroll_frames(app, widget, frames))
+        widget.close()
+        gym_core.get_repository().close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Monthly Jalali reports from the analytics rollups vs. pulling every member into Python.
+
+Usage: python benchmarks/bench_reports.py [members]
+
+Builds a synthetic gym with three years of history, times monthly_report()
+for each Jalali year against the same figures computed from get_all_users(),
+then edits, renews and deletes members and checks that the trigger-maintained
+signup and expiry rollups still equal a fresh rebuild_analytics().
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+from datasets import build_dataset
+
+
+def python_report(year, today):
+    """The report's signup, expiry and uptake figures computed from the raw users table."""
+    months = gym_core.jalali_year_months(year)
+    report = [dict.fromkeys(gym_core.REPORT_FIELDS, 0) for _ in months]
+    for user in gym_core.get_all_users():
+        registered = datetime.fromtimestamp(user[10]).toordinal()
+        expires = datetime.fromtimestamp(user[11]).toordinal()
+        kind = 'vip' if user[3] == 'vip' else 'normal'
+        for row, (_, first, last) in zip(report, months):
+            if first <= registered <= last:
+                row[f'signups_{kind}'] += 1
+                row['diet'] += user[4] != 0
+                row['training'] += user[5] != 0
+                row['coach'] += user[6] != 0
+            if first <= expires <= last:
+                row['churned' if expires < today else 'due'] += 1
+    return report
+
+
+def rollups(conn):
+    return (
+        conn.execute('SELECT * FROM analytics_signups WHERE signups != 0 ORDER BY day, program_type').fetchall(),
+        conn.execute('SELECT * FROM analytics_expirations WHERE members != 0 ORDER BY day, program_type').fetchall(),
+    )
+
+
+def timed_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2], result
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        repository = build_dataset(os.path.join(tmp, 'bench.db'), members)
+        print(f"{members} members inserted in {time.perf_counter() - start:.1f} s (rollups maintained by triggers)")
+
+        now = datetime.now()
+        today = now.toordinal()
+        this_year = gym_core.jalali_year(today)
+        for year in range(this_year - 3, this_year + 1):
+            report_ms, report = timed_ms(lambda: gym_core.monthly_report(year, now), repeat=20)
+            python_ms, expected = timed_ms(lambda: python_report(year, today), repeat=1)
+            for month, wanted in zip(report, expected):
+                for field in ('signups_normal', 'signups_vip', 'churned', 'due', 'diet', 'training', 'coach'):
+                    assert month[field] == wanted[field], (year, month['month'], field, month[field], wanted[field])
+            print(f"year {year}   rollups {report_ms:8.2f} ms   get_all_users in Python {python_ms:9.1f} ms")
+
+        rng = random.Random(1)
+        for _ in range(2000):
+            user_id = rng.randint(1, members)
+            roll = rng.random()
+            if roll < 0.4:
+                repository.renew_subscription(user_id)
+            elif roll < 0.7:
+                repository.update_user_fields(user_id, {'program_type': rng.choice(['normal', 'vip']), 'active': True})
+            elif roll < 0.8:
+                repository.update_user_fields(user_id, {'active': False})
+            elif roll < 0.9:
+                repository.update_user_fields(user_id, {field: rng.random() < 0.5 for field in ('diet', 'training', 'coach')})
+            else:
+                repository.delete_user(user_id)
+        conn = repository.connection()
+        incremental = rollups(conn)
+        start = time.perf_counter()
+        repository.rebuild_analytics()
+        elapsed = time.perf_counter() - start
+        assert rollups(conn) == incremental, "incremental rollups drifted from a rebuild"
+        print(f"signup and expiry rollups match a full rebuild after 2000 edits; rebuild took {elapsed:.2f} s")
+        repository.close()
+
+
+if __name__ == '__main__':
+    main()
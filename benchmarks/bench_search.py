@@ -0,0 +1,54 @@
+"""Search latency histogram while "typing" a query, plus time-to-cancel.
+
+Usage: python benchmarks/bench_search.py [members]
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+import gym_perf
+from bench_connections import populate
+
+TYPED = ["m", "me", "mem", "memb", "membe", "member", "member 4", "member 42", "member 421", "0912", "09120042"]
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        gym_core.set_repository(gym_core.UserRepository(db_name))
+        gym_core.init_db()
+        populate(db_name, members)
+
+        histogram = gym_perf.LatencyHistogram()
+        for _ in range(5):
+            for query in TYPED:
+                start = time.perf_counter()
+                gym_core.fetch_users_page(query, 0, gym_core.PAGE_SIZE)
+                histogram.record(time.perf_counter() - start)
+        print(f"{members} members, first page per keystroke")
+        print(json.dumps(histogram.summary(), indent=2))
+
+        # A query with no matches has to scan the whole table; cancel it midway.
+        cancelled = threading.Event()
+        timer = threading.Timer(0.005, cancelled.set)
+        start = time.perf_counter()
+        timer.start()
+        try:
+            with gym_core.get_repository().interruptible(cancelled.is_set):
+                gym_core.fetch_users_page("no such member", 0, gym_core.PAGE_SIZE)
+            print("query finished before cancellation")
+        except sqlite3.OperationalError:
+            print(f"cancelled full scan after {(time.perf_counter() - start) * 1000:.1f} ms")
+        gym_core.get_repository().close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Throughput of gym_server with several front desks reading and writing at once.
+
+Usage: python benchmarks/bench_server.py [members] [clients] [seconds]
+
+Starts the server on a free localhost port over a temporary database. Each
+client thread then mixes reads (list pages, profile lookups, stats) with
+roughly one write in five (renewals and new members).
+"""
+import os
+import itertools
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+import gym_perf
+from bench_connections import populate
+from gym_server import GymServer, RemoteRepository
+
+
+def client(remote, members, seed, deadline, reads, writes):
+    rng = random.Random(seed)
+    phones = (f"0935{seed:02d}{n:05d}" for n in itertools.count())
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        roll = rng.random()
+        if roll < 0.1:
+            remote.renew_subscription(rng.randint(1, members))
+            writes.record(time.perf_counter() - start)
+        elif roll < 0.2:
+            remote.add_user(f"member {seed}-{rng.random()}", next(phones), 'normal', 0, 1, 0)
+            writes.record(time.perf_counter() - start)
+        else:
+            if roll < 0.5:
+                remote.list_users('', 'expiration', None, gym_core.PAGE_SIZE)
+            elif roll < 0.8:
+                remote.get_user_by_id(rng.randint(1, members))
+            else:
+                remote.get_user_stats()
+            reads.record(time.perf_counter() - start)
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        repository = gym_core.UserRepository(db_name)
+        gym_core.set_repository(repository)
+        gym_core.init_db()
+        populate(db_name, members)
+
+        server = GymServer(repository, port=0)
+        host, port = server.start_in_thread()
+        remote = RemoteRepository(f"http://{host}:{port}")
+        reads, writes = gym_perf.LatencyHistogram(), gym_perf.LatencyHistogram()
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(target=client, args=(remote, members, seed, deadline, reads, writes))
+            for seed in range(clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        remote.close()
+        server.stop()
+
+        for label, histogram in (("reads", reads), ("writes", writes)):
+            summary = histogram.summary()
+            print(f"{label:<7} {summary['count'] / seconds:8.0f}/s  mean {summary['mean_ms']:7.2f} ms  "
+                  f"p95 <= {histogram.percentile(0.95):.1f} ms  max {summary['max_ms']:7.1f} ms")
+        print(f"{server.batched_writes} writes committed in {server.batches} transactions "
+              f"({server.batched_writes / max(server.batches, 1):.1f} per commit), {clients} clients")
+        repository.close()
+
+
+if __name__ == '__main__':
+    main()
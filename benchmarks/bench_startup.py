@@ -0,0 +1,40 @@
+"""Cold-start time of the headless CLI compared with importing the GUI.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def median_runtime(command, runs, env):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'bench.db')
+        env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+        cases = [
+            ("python -c pass", [sys.executable, '-c', 'pass']),
+            ("gym_cli.py stats", [sys.executable, 'gym_cli.py', '--db', db_name, 'stats']),
+            ("gym_cli.py search", [sys.executable, 'gym_cli.py', '--db', db_name, 'search', 'ali']),
+            ("import gym (GUI stack)", [sys.executable, '-c', 'import gym']),
+        ]
+        for label, command in cases:
+            print(f"{label:<26} {median_runtime(command, runs, env) * 1000:8.1f} ms (median of {runs})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic gym member databases for benchmarks.
+
+Names are drawn from common Persian first and last names, phones are unique
+Iranian mobile numbers, about a fifth of members are VIP and roughly 45% hold
+a current subscription; the rest lapsed at some 30-day boundary after signing
+up within the last three years.
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+
+FIRST_NAMES = [
+    "علی", "محمد", "حسین", "رضا", "مهدی", "امیر", "حسن", "سعید", "مجتبی", "نیما",
+    "فاطمه", "زهرا", "مریم", "سارا", "نگار", "الهام", "مینا", "لیلا", "پریسا", "نرگس",
+]
+LAST_NAMES = [
+    "احمدی", "محمدی", "حسینی", "رضایی", "کریمی", "موسوی", "جعفری", "صادقی", "رحیمی", "هاشمی",
+    "قاسمی", "نوری", "عباسی", "کاظمی", "فتوحی", "شریفی", "اکبری", "ابراهیمی", "یوسفی", "طاهری",
+]
+OPERATOR_PREFIXES = ["10", "11", "12", "13", "19", "30", "35", "36", "90", "91"]
+HISTORY_DAYS = 3 * 365
+ACTIVE_SHARE = 0.45
+
+
+def member_rows(members, seed=0, now=None):
+    """Yield INSERT_USER_SQL value tuples for a synthetic gym of the given size."""
+    rng = random.Random(seed)
+    now = now or datetime.now()
+    for i in range(members):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        # 7919 is coprime with 10**8, so i -> number is a bijection and phones never repeat.
+        phone = f"09{rng.choice(OPERATOR_PREFIXES)[1]}{(i * 7919 + seed) % 10 ** 8:08d}"
+        registration = now - timedelta(days=rng.randrange(HISTORY_DAYS), seconds=rng.randrange(86400))
+        if rng.random() < ACTIVE_SHARE:
+            expiration = now + timedelta(days=rng.randrange(30), seconds=rng.randrange(86400))
+        else:
+            periods = max(1, (now - registration).days // 30)
+            expiration = registration + timedelta(days=30 * rng.randint(1, periods))
+            if expiration > now:
+                expiration = now - timedelta(days=rng.randrange(1, 30))
+        yield (
+            name, phone, 'vip' if rng.random() < 0.2 else 'normal',
+            int(rng.random() < 0.4), int(rng.random() < 0.6), int(rng.random() < 0.25),
+            registration.isoformat(), expiration.isoformat(), int(rng.random() < 0.9),
+            gym_core.to_epoch(registration), gym_core.to_epoch(expiration),
+        )
+
+
+def build_dataset(db_name, members, seed=0, batch_size=50000):
+    """Create db_name with the current schema and fill it with synthetic members."""
+    repository = gym_core.UserRepository(db_name)
+    gym_core.set_repository(repository)
+    gym_core.init_db()
+    batch = []
+    for row in member_rows(members, seed):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            repository.insert_users(batch)
+            batch = []
+    if batch:
+        repository.insert_users(batch)
+    return repository
+
+
+def dataset_path(data_dir, members, seed=0):
+    """Path of a cached dataset, building it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"gym-{members}-{seed}.db")
+    if not os.path.exists(path):
+        partial = path + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        build_dataset(partial, members, seed).close()
+        os.replace(partial, path)
+    return path
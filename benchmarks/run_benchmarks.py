@@ -0,0 +1,159 @@
+"""Benchmark the data layer and table refresh on synthetic gyms of growing size.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10000 100000 1000000]
+        [--repeat 20] [--output results.json] [--compare baseline.json]
+
+Datasets are cached in benchmarks/data/. Each run writes its timings as JSON
+(to benchmarks/results/ by default). With --compare, medians are checked
+against an earlier results file, and the exit status is 1 if any got more
+than --tolerance slower.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import gym_core
+from datasets import dataset_path
+
+SEARCH_QUERIES = ["علی", "رضایی", "محمد حسینی", "0912", "09351234", "no such member"]
+
+
+def timings(func, repeat):
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'min_ms': samples[0],
+        'median_ms': statistics.median(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        'max_ms': samples[-1],
+    }
+
+
+def headless_refresh():
+    """Build UsersTableModel offscreen and read every role of the first page, or None without PyQt5."""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtWidgets import QApplication
+        import gym
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    model = gym.UsersTableModel()
+    roles = [Qt.DisplayRole, Qt.TextAlignmentRole, Qt.FontRole, Qt.BackgroundRole, Qt.ForegroundRole]
+
+    def refresh(_):
+        model.set_query('')
+        for row in range(model.rowCount()):
+            for col in range(model.columnCount()):
+                index = model.index(row, col)
+                for role in roles:
+                    model.data(index, role)
+        app.processEvents()
+
+    return refresh
+
+
+def run_size(members, data_dir, repeat, slow_repeat):
+    path = dataset_path(data_dir, members)
+    gym_core.set_repository(gym_core.UserRepository(path))
+    gym_core.init_db()
+    rng = random.Random(members)
+    ids = [rng.randint(1, members) for _ in range(repeat)]
+    phones = [gym_core.get_user_by_id(user_id)[2] for user_id in ids]
+    results = {
+        'get_all_users': timings(lambda i: gym_core.get_all_users(), slow_repeat),
+        'get_user_by_id': timings(lambda i: gym_core.get_user_by_id(ids[i]), repeat),
+        'get_user_stats': timings(lambda i: gym_core.get_user_stats(), repeat),
+        'fetch_users_page': timings(lambda i: gym_core.fetch_users_page('', 0), repeat),
+        'update_user': timings(
+            lambda i: gym_core.update_user(ids[i], f"عضو {i}", phones[i], 'normal', 1, 0, 1, 1), repeat
+        ),
+        'renew_subscription': timings(lambda i: gym_core.renew_subscription(ids[i]), repeat),
+    }
+    for query in SEARCH_QUERIES:
+        results[f'search_users[{query}]'] = timings(lambda i: gym_core.search_users(query), slow_repeat)
+    refresh = headless_refresh()
+    if refresh is not None:
+        results['refresh_table'] = timings(refresh, repeat)
+    gym_core.get_repository().close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, operations in results['sizes'].items():
+        for name, current in operations.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not previous:
+                continue
+            ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else 1.0
+            marker = ''
+            if ratio > 1 + tolerance:
+                marker = '  REGRESSION'
+                regressions.append((size, name, ratio))
+            print(f"{size:>8} {name:<36} {previous['median_ms']:10.3f} -> {current['median_ms']:10.3f} ms "
+                  f"x{ratio:5.2f}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--slow-repeat', type=int, default=5, help="runs for whole-table operations")
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'))
+    parser.add_argument('--output')
+    parser.add_argument('--compare', help="earlier results JSON to compare medians against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'sizes': {},
+    }
+    for members in args.sizes:
+        print(f"benchmarking {members} members...", file=sys.stderr)
+        results['sizes'][str(members)] = run_size(members, args.data_dir, args.repeat, args.slow_repeat)
+
+    output = args.output or os.path.join(
+        HERE, 'results', f"run-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    else:
+        for size, operations in results['sizes'].items():
+            for name, timing in operations.items():
+                print(f"{size:>8} {name:<36} median {timing['median_ms']:10.3f} ms  p95 {timing['p95_ms']:10.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
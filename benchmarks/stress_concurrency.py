@@ -0,0 +1,123 @@
+"""Check the data layer's concurrency guarantee with parallel readers and writers.
+
+Usage: python benchmarks/stress_concurrency.py [seconds] [writer_processes] [reader_threads]
+
+Writer processes add, renew and update members while reader threads in this
+process check, each inside one read transaction, that the trigger-maintained
+counters agree with the users table. The exit status is 1 if any reader saw
+an inconsistent snapshot, if any operation failed with "database is locked",
+or if the final member count disagrees with the number of successful adds.
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gym_core
+from bench_connections import populate
+
+MEMBERS = 20000
+
+
+def writer(db_name, seed, seconds, results):
+    repository = gym_core.UserRepository(db_name)
+    rng = random.Random(seed)
+    added = writes = errors = batches = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            roll = rng.random()
+            if roll < 0.4:
+                repository.add_user(f"writer {seed}", f"0935{seed:02d}{added:05d}", 'normal', 0, 1, 0)
+                added += 1
+            elif roll < 0.7:
+                repository.renew_subscription(rng.randint(1, MEMBERS))
+            elif roll < 0.9:
+                user_id = rng.randint(1, MEMBERS)
+                phone = repository.get_user_by_id(user_id)[2]
+                repository.update_user(user_id, f"member {seed}", phone, 'vip', 1, 1, 0, rng.random() < 0.5)
+            else:
+                repository.insert_users([
+                    (f"batch {seed}", f"0936{seed:02d}{batches:04d}{i:02d}", 'normal', 0, 0, 0,
+                     '2024-01-01T00:00:00', '2024-01-31T00:00:00', 0, 1704067200, 1706659200)
+                    for i in range(50)
+                ])
+                batches += 1
+                added += 50
+            writes += 1
+        except sqlite3.OperationalError as exc:
+            errors += 1
+            print(f"writer {seed}: {exc}", file=sys.stderr)
+    repository.close()
+    results.put((added, writes, errors))
+
+
+def reader(repository, seconds, stats):
+    conn = repository.connection()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            conn.execute('BEGIN')
+            counters = conn.execute('SELECT total, active, inactive FROM user_counters WHERE id=1').fetchone()
+            actual = conn.execute('SELECT COUNT(*), SUM(active = 1), SUM(active = 0) FROM users').fetchone()
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError as exc:
+            stats['errors'] += 1
+            print(f"reader: {exc}", file=sys.stderr)
+            continue
+        stats['reads'] += 1
+        if counters != actual:
+            stats['inconsistent'] += 1
+            print(f"reader: counters {counters} != table {actual}", file=sys.stderr)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, 'stress.db')
+        repository = gym_core.UserRepository(db_name)
+        gym_core.set_repository(repository)
+        gym_core.init_db()
+        populate(db_name, MEMBERS)
+
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=writer, args=(db_name, seed, seconds, results))
+            for seed in range(writers)
+        ]
+        reader_stats = [{'reads': 0, 'inconsistent': 0, 'errors': 0} for _ in range(readers)]
+        threads = [threading.Thread(target=reader, args=(repository, seconds, stats)) for stats in reader_stats]
+        for worker in processes + threads:
+            worker.start()
+        outcomes = [results.get() for _ in processes]
+        for worker in processes + threads:
+            worker.join()
+
+        added = sum(outcome[0] for outcome in outcomes)
+        writes = sum(outcome[1] for outcome in outcomes)
+        write_errors = sum(outcome[2] for outcome in outcomes)
+        reads = sum(stats['reads'] for stats in reader_stats)
+        inconsistent = sum(stats['inconsistent'] for stats in reader_stats)
+        read_errors = sum(stats['errors'] for stats in reader_stats)
+        total = repository.connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        repository.close()
+
+    print(f"{writers} writer processes: {writes / seconds:.0f} transactions/s, {write_errors} lock errors")
+    print(f"{readers} reader threads: {reads / seconds:.0f} snapshot checks/s, {inconsistent} inconsistent, "
+          f"{read_errors} lock errors")
+    print(f"members {total}, expected {MEMBERS + added}")
+    failed = write_errors or read_errors or inconsistent or total != MEMBERS + added
+    print("FAILED" if failed else "OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
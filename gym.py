@@ -1,183 +1,319 @@
+import math
+import os
 import sys
 import sqlite3
-from datetime import datetime, timedelta
-from jdatetime import datetime as jdatetime, date
+import threading
+import time
+from datetime import datetime
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QLineEdit, QComboBox, QCheckBox, QTableWidget, QTableWidgetItem,
+    QLabel, QLineEdit, QComboBox, QCheckBox, QTableView, QAbstractItemView, QTableWidget,
+    QTableWidgetItem, QFileDialog, QShortcut,
     QDialog, QFormLayout, QMessageBox, QScrollArea, QSizePolicy, QHeaderView,
-    QStyledItemDelegate, QStyleOptionViewItem, QStyle, QFrame
+    QStyledItemDelegate, QStyle, QFrame, QStackedWidget, QSpinBox
 )
-from PyQt5.QtCore import Qt, QDateTime, QTimer
-from PyQt5.QtGui import QIcon, QFont, QColor, QPalette, QBrush, QPixmap
-
-# Database setup
-DB_NAME = 'gym_management.db'
-
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            program_type TEXT NOT NULL,
-            diet BOOLEAN NOT NULL,
-            training BOOLEAN NOT NULL,
-            coach BOOLEAN NOT NULL,
-            registration_date TEXT NOT NULL,
-            expiration_date TEXT NOT NULL,
-            active BOOLEAN NOT NULL DEFAULT 1
-        )
-    ''')
-    cursor.execute("PRAGMA table_info(users)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if 'active' not in columns:
-        cursor.execute('ALTER TABLE users ADD COLUMN active BOOLEAN NOT NULL DEFAULT 1')
-    conn.commit()
-    conn.close()
-
-def add_user(name, phone, program_type, diet, training, coach, active=True):
-    registration_date = datetime.now().isoformat()
-    expiration_date = (datetime.now() + timedelta(days=30)).isoformat()
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO users (name, phone, program_type, diet, training, coach, registration_date, expiration_date, active)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (name, phone, program_type, int(diet), int(training), int(coach), registration_date, expiration_date, int(active)))
-    conn.commit()
-    conn.close()
-
-def update_user(user_id, name, phone, program_type, diet, training, coach, active):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT active FROM users WHERE id=?', (user_id,))
-    result = cursor.fetchone()
-    current_active = result[0] if result else 0
-    
-    if active and not current_active:
-        new_expiration = (datetime.now() + timedelta(days=30)).isoformat()
-        cursor.execute('''
-            UPDATE users SET name=?, phone=?, program_type=?, diet=?, training=?, coach=?, active=?, expiration_date=?
-            WHERE id=?
-        ''', (name, phone, program_type, int(diet), int(training), int(coach), int(active), new_expiration, user_id))
-    else:
-        cursor.execute('''
-            UPDATE users SET name=?, phone=?, program_type=?, diet=?, training=?, coach=?, active=?
-            WHERE id=?
-        ''', (name, phone, program_type, int(diet), int(training), int(coach), int(active), user_id))
-    conn.commit()
-    conn.close()
-
-def delete_user(user_id):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM users WHERE id=?', (user_id,))
-    conn.commit()
-    conn.close()
-
-def get_all_users():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users')
-    users = cursor.fetchall()
-    conn.close()
-    return users
-
-def get_user_stats():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM users')
-    total_users = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM users WHERE active=1')
-    active_users = cursor.fetchone()[0]
-    cursor.execute('SELECT COUNT(*) FROM users WHERE active=0')
-    inactive_users = cursor.fetchone()[0]
-    conn.close()
-    return total_users, active_users, inactive_users
-
-def search_users(query):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT * FROM users WHERE name LIKE ? OR phone LIKE ?
-    ''', (f'%{query}%', f'%{query}%'))
-    users = cursor.fetchall()
-    conn.close()
-    return users
-
-def get_user_by_id(user_id):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id=?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
-    return user
-
-def renew_subscription(user_id):
-    new_expiration = (datetime.now() + timedelta(days=30)).isoformat()
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET expiration_date=?, active=1 WHERE id=?', (new_expiration, user_id))
-    conn.commit()
-    conn.close()
-
-def is_subscription_active(expiration_date):
-    exp_date = datetime.fromisoformat(expiration_date)
-    return datetime.now() < exp_date
-
-def to_jalali(iso_date):
-    dt = datetime.fromisoformat(iso_date)
-    jdt = jdatetime.fromgregorian(datetime=dt)
-    return jdt.strftime('%Y/%m/%d')
-
-def get_current_jalali_date_time():
-    now = datetime.now()
-    jnow = jdatetime.fromgregorian(datetime=now)
-    persian_days = {
-        'Saturday': 'شنبه',
-        'Sunday': 'یکشنبه',
-        'Monday': 'دوشنبه',
-        'Tuesday': 'سه‌شنبه',
-        'Wednesday': 'چهارشنبه',
-        'Thursday': 'پنجشنبه',
-        'Friday': 'جمعه'
-    }
-    weekday_eng = jnow.strftime('%A')
-    weekday = persian_days.get(weekday_eng, weekday_eng)
-    date_str = jnow.strftime('%Y/%m/%d')
-    time_str = now.strftime('%H:%M:%S')
-    return f"{weekday} - {date_str} - {time_str}"
+from PyQt5.QtCore import (
+    Qt, QDateTime, QTimer, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+    QThreadPool, pyqtSignal
+)
+from PyQt5.QtGui import QIcon, QFont, QColor, QPalette, QBrush, QPixmap, QKeySequence, QPainter, QFontMetrics
+from gym_core import (
+    PAGE_SIZE, CHANGE_BATCH_SIZE, init_db, add_user, update_user_fields, delete_user,
+    renew_subscription, get_user_stats, data_version, list_users, get_users_by_ids,
+    latest_change, get_changes_since, get_repository, UserRepository, set_repository,
+    expire_lapsed_users, next_expiration, is_subscription_active, to_epoch, to_jalali, to_jalali_batch,
+    get_current_jalali_date_time, monthly_report, jalali_year
+)
+import gym_backup
+import gym_perf
+from gym_perf import timed
 
 class CheckBoxDelegate(QStyledItemDelegate):
+    """Draws boolean cells as a green ✓ or a red ✗.
+
+    Each glyph is rendered once per device pixel ratio into a shared pixmap,
+    so painting a cell is a single blit rather than font setup and text layout.
+    """
+
+    CHECKBOX_SIZE = 32
+    _glyphs = {}
+
+    @classmethod
+    def glyph(cls, checked, ratio):
+        """Pixmap for the glyph and its offset from the text baseline origin."""
+        key = (checked, ratio)
+        cached = cls._glyphs.get(key)
+        if cached is None:
+            text = "✓" if checked else "✗"
+            font = QFont("Arial", 28, QFont.Bold)
+            bounds = QFontMetrics(font).boundingRect(text)
+            pixmap = QPixmap(round(bounds.width() * ratio), round(bounds.height() * ratio))
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+            painter = QPainter(pixmap)
+            painter.setPen(QColor("green" if checked else "red"))
+            painter.setFont(font)
+            painter.drawText(-bounds.left(), -bounds.top(), text)
+            painter.end()
+            cached = cls._glyphs[key] = (pixmap, bounds.topLeft())
+        return cached
+
+    @timed('ui.CheckBoxDelegate.paint')
     def paint(self, painter, option, index):
         value = index.data(Qt.DisplayRole)
         if value is not None:
-            opt = QStyleOptionViewItem(option)
-            self.initStyleOption(opt, index)
-            
-            checkbox_size = 32
-            x = opt.rect.x() + (opt.rect.width() - checkbox_size) // 2
-            y = opt.rect.y() + (opt.rect.height() - checkbox_size) // 2
-            
-            painter.save()
-            if bool(value):
-                painter.setPen(QColor("green"))
-                painter.setFont(QFont("Arial", 28, QFont.Bold))
-                painter.drawText(x, y + checkbox_size - 5, "✓")
+            pixmap, offset = self.glyph(bool(value), painter.device().devicePixelRatioF())
+            rect = option.rect
+            x = rect.x() + (rect.width() - self.CHECKBOX_SIZE) // 2
+            y = rect.y() + (rect.height() - self.CHECKBOX_SIZE) // 2
+            painter.drawPixmap(x + offset.x(), y + self.CHECKBOX_SIZE - 5 + offset.y(), pixmap)
+
+class UsersTableModel(QAbstractTableModel):
+    """Lazily loaded view of the users table.
+
+    Rows are pulled from the database in batches through canFetchMore/fetchMore
+    as the view scrolls, and all styling is answered from shared fonts and
+    brushes in data(), so no per-cell item objects are ever created.
+    """
+
+    HEADERS = [
+        "شناسه", "نام", "شماره", "نوع", "غذایی", "تمرینی", "مربی", "وضعیت کاربر", "وضعیت اشتراک", "انقضا"
+    ]
+    BATCH_SIZE = PAGE_SIZE
+    # Table column -> index in the users row for the boolean columns
+    FLAG_COLUMNS = {4: 4, 5: 5, 6: 6, 7: 9}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._query = ''
+        self._cursor = None
+        self._exhausted = False
+        self._font = QFont("Arial", 13, QFont.Bold)
+        self._expired_brush = QBrush(QColor(255, 180, 180))
+        self._active_brush = QBrush(QColor(255, 255, 255))
+        self._active_color = QColor("green")
+        self._expired_color = QColor("red")
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    @timed('ui.UsersTableModel.fetchMore')
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        users, self._cursor = list_users(self._query, cursor=self._cursor, limit=self.BATCH_SIZE)
+        self._exhausted = self._cursor is None
+        if not users:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(users) - 1)
+        self._rows.extend(self._wrap(users))
+        self.endInsertRows()
+
+    def set_query(self, query):
+        self.beginResetModel()
+        self._query = query
+        self._rows = []
+        self._cursor = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    @staticmethod
+    def _wrap(users):
+        exp_dates = to_jalali_batch([user[8] for user in users])
+        now_ts = to_epoch(datetime.now())
+        return [
+            (user, user[11] > now_ts, exp_date)
+            for user, exp_date in zip(users, exp_dates)
+        ]
+
+    def set_rows(self, query, users, cursor):
+        """Replace the contents with a first batch that was fetched elsewhere."""
+        self.beginResetModel()
+        self._query = query
+        self._rows = self._wrap(users)
+        self._cursor = cursor
+        self._exhausted = cursor is None
+        self.endResetModel()
+
+    def refresh(self):
+        """Reload the rows already loaded and patch the differences into the view.
+
+        Rows are compared by id and only the rows that were added, removed or
+        changed are signalled, so the view keeps its scroll position and
+        selection instead of being reset.
+        """
+        if not self._rows:
+            self.set_query(self._query)
+            return
+        users, cursor = list_users(self._query, limit=max(len(self._rows), self.BATCH_SIZE))
+        self.merge_rows(users, cursor)
+
+    def merge_rows(self, users, cursor):
+        fresh = self._wrap(users)
+        last_column = len(self.HEADERS) - 1
+        row = 0
+        for item in fresh:
+            while row < len(self._rows) and self._rows[row][0][0] < item[0][0]:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            if row < len(self._rows) and self._rows[row][0][0] == item[0][0]:
+                if self._rows[row] != item:
+                    self._rows[row] = item
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
             else:
-                painter.setPen(QColor("red"))
-                painter.setFont(QFont("Arial", 28, QFont.Bold))
-                painter.drawText(x, y + checkbox_size - 5, "✗")
-            painter.restore()
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.insert(row, item)
+                self.endInsertRows()
+            row += 1
+        if row < len(self._rows):
+            self.beginRemoveRows(QModelIndex(), row, len(self._rows) - 1)
+            del self._rows[row:]
+            self.endRemoveRows()
+        self._cursor = cursor
+        self._exhausted = cursor is None
+
+    def apply_changes(self, user_ids, users):
+        """Patch the given member ids from their fresh rows without reloading the rest.
+
+        users holds the rows of those ids that still exist and match the query;
+        loaded ids without one are removed. New ids past the last loaded row are
+        left for fetchMore unless everything is already loaded.
+        """
+        fresh = {item[0][0]: item for item in self._wrap(users)} if users else {}
+        last_column = len(self.HEADERS) - 1
+        for user_id in sorted(user_ids):
+            row = self._position(user_id)
+            loaded = row < len(self._rows) and self._rows[row][0][0] == user_id
+            item = fresh.get(user_id)
+            if loaded and item is None:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+            elif loaded:
+                if self._rows[row] != item:
+                    self._rows[row] = item
+                    self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            elif item is not None and (row < len(self._rows) or self._exhausted):
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._rows.insert(row, item)
+                self.endInsertRows()
+
+    def _position(self, user_id):
+        """Index of the first loaded row whose id is not below user_id."""
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._rows[middle][0][0] < user_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def refresh_expired(self, now_ts=None):
+        """Repaint the loaded rows whose subscription has ended since they were read."""
+        now_ts = now_ts if now_ts is not None else to_epoch(datetime.now())
+        last_column = len(self.HEADERS) - 1
+        for row, (user, active_sub, exp_date) in enumerate(self._rows):
+            if active_sub and user[11] <= now_ts:
+                self._rows[row] = (user, False, exp_date)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+    def query(self):
+        return self._query
+
+    def user_at(self, row):
+        return self._rows[row][0]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        user, active_sub, exp_date = self._rows[index.row()]
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col in self.FLAG_COLUMNS:
+                return bool(user[self.FLAG_COLUMNS[col]])
+            if col == 0:
+                return str(user[0])
+            if col == 3:
+                return 'عادی' if user[3] == 'normal' else 'ویژه'
+            if col == 8:
+                return "فعال" if active_sub else "منقضی"
+            if col == 9:
+                return exp_date
+            return user[col]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        if role == Qt.FontRole:
+            return None if col in self.FLAG_COLUMNS else self._font
+        if role == Qt.BackgroundRole:
+            return self._active_brush if active_sub else self._expired_brush
+        if role == Qt.ForegroundRole and col == 8:
+            return self._active_color if active_sub else self._expired_color
+        return None
+
+# Time from starting a search to its rows being shown
+SEARCH_LATENCY = gym_perf.histogram('ui.search')
+
+class SearchSignals(QObject):
+    finished = pyqtSignal(int, str, list, object, float)
+    failed = pyqtSignal(int, str)
+
+class SearchWorker(QRunnable):
+    """Runs one search on a pool thread; cancel() interrupts the running query."""
+
+    def __init__(self, generation, query, started):
+        super().__init__()
+        self.generation = generation
+        self.query = query
+        self.started = started
+        self.signals = SearchSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        if self._cancelled.is_set():
+            return
+        try:
+            with get_repository().interruptible(self._cancelled.is_set):
+                users, cursor = list_users(self.query, limit=UsersTableModel.BATCH_SIZE)
+        except Exception as exc:
+            # An exception escaping a QRunnable aborts the application, so
+            # failures (a locked database, an unreachable server) are reported
+            if not self._cancelled.is_set():
+                self.signals.failed.emit(self.generation, str(exc) or type(exc).__name__)
+            return
+        if not self._cancelled.is_set():
+            self.signals.finished.emit(self.generation, self.query, users, cursor, self.started)
 
 class UserProfileDialog(QDialog):
-    def __init__(self, user, parent=None):
+    """Profile editor that is built once and rebound to a member with bind().
+
+    bind() fills the widgets from a users row the caller already holds, and
+    save_changes() writes only the fields that were edited.
+    """
+
+    @timed('ui.UserProfileDialog')
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.user = user
-        self.setWindowTitle(f"پروفایل: {user[1]}")
+        self.user = None
+        self._original = {}
         self.setMinimumSize(800, 700)
         self.setLayoutDirection(Qt.RightToLeft)
         
@@ -192,17 +328,16 @@ class UserProfileDialog(QDialog):
         form_layout.setFormAlignment(Qt.AlignRight | Qt.AlignTop)
         form_layout.setSpacing(25)
 
-        self.name_edit = QLineEdit(user[1])
+        self.name_edit = QLineEdit()
         self.name_edit.setFont(QFont("Arial", 26))
         self.name_edit.setMinimumHeight(55)
         self.name_edit.setAlignment(Qt.AlignRight)
-        self.phone_edit = QLineEdit(user[2])
+        self.phone_edit = QLineEdit()
         self.phone_edit.setFont(QFont("Arial", 26))
         self.phone_edit.setMinimumHeight(55)
         self.phone_edit.setAlignment(Qt.AlignRight)
         self.program_type_combo = QComboBox()
         self.program_type_combo.addItems(['عادی', 'ویژه'])
-        self.program_type_combo.setCurrentText('عادی' if user[3] == 'normal' else 'ویژه')
         self.program_type_combo.setFont(QFont("Arial", 26))
         self.program_type_combo.setMinimumHeight(55)
         self.program_type_combo.setLayoutDirection(Qt.RightToLeft)
@@ -212,7 +347,6 @@ class UserProfileDialog(QDialog):
         diet_layout = QHBoxLayout(diet_container)
         diet_layout.setContentsMargins(0, 0, 0, 0)
         self.diet_check = QCheckBox()
-        self.diet_check.setChecked(bool(user[4]))
         self.diet_check.setFont(QFont("Arial", 26))
         diet_layout.addWidget(self.diet_check)
         diet_layout.addStretch()
@@ -222,7 +356,6 @@ class UserProfileDialog(QDialog):
         training_layout = QHBoxLayout(training_container)
         training_layout.setContentsMargins(0, 0, 0, 0)
         self.training_check = QCheckBox()
-        self.training_check.setChecked(bool(user[5]))
         self.training_check.setFont(QFont("Arial", 26))
         training_layout.addWidget(self.training_check)
         training_layout.addStretch()
@@ -232,23 +365,18 @@ class UserProfileDialog(QDialog):
         coach_layout = QHBoxLayout(coach_container)
         coach_layout.setContentsMargins(0, 0, 0, 0)
         self.coach_check = QCheckBox()
-        self.coach_check.setChecked(bool(user[6]))
         self.coach_check.setFont(QFont("Arial", 26))
         coach_layout.addWidget(self.coach_check)
         coach_layout.addStretch()
         
-        reg_date = to_jalali(user[7])
-        exp_date = to_jalali(user[8])
-        self.reg_label = QLabel(f"تاریخ ثبت‌نام: {reg_date}")
+        self.reg_label = QLabel()
         self.reg_label.setFont(QFont("Arial", 26))
         self.reg_label.setAlignment(Qt.AlignRight)
-        self.exp_label = QLabel(f"تاریخ انقضا: {exp_date}")
+        self.exp_label = QLabel()
         self.exp_label.setFont(QFont("Arial", 26))
         self.exp_label.setAlignment(Qt.AlignRight)
-        active_sub = is_subscription_active(user[8])
-        self.status_label = QLabel("فعال" if active_sub else "منقضی")
+        self.status_label = QLabel()
         self.status_label.setFont(QFont("Arial", 26, QFont.Bold))
-        self.status_label.setStyleSheet("color: green;" if active_sub else "color: red;")
         self.status_label.setAlignment(Qt.AlignRight)
         
         active_container = QWidget()
@@ -256,7 +384,6 @@ class UserProfileDialog(QDialog):
         active_layout = QHBoxLayout(active_container)
         active_layout.setContentsMargins(0, 0, 0, 0)
         self.active_check = QCheckBox("فعال")
-        self.active_check.setChecked(bool(user[9]))
         self.active_check.setFont(QFont("Arial", 26))
         self.active_check.setLayoutDirection(Qt.RightToLeft)
         active_layout.addWidget(self.active_check)
@@ -267,7 +394,6 @@ class UserProfileDialog(QDialog):
         renew_layout = QHBoxLayout(renew_container)
         renew_layout.setContentsMargins(0, 0, 0, 0)
         self.renew_check = QCheckBox("تمدید اشتراک (۳۰ روز)")
-        self.renew_check.setEnabled(not active_sub)
         self.renew_check.setFont(QFont("Arial", 26))
         self.renew_check.setLayoutDirection(Qt.RightToLeft)
         renew_layout.addWidget(self.renew_check)
@@ -307,7 +433,7 @@ class UserProfileDialog(QDialog):
         buttons_container = QWidget()
         buttons_container.setLayoutDirection(Qt.RightToLeft)
         buttons = QHBoxLayout(buttons_container)
-        save_btn = QPushButton("ذخیره")
+        self.save_btn = save_btn = QPushButton("ذخیره")
         save_btn.setFont(QFont("Arial", 26))
         save_btn.setMinimumHeight(65)
         save_btn.setMinimumWidth(150)
@@ -329,14 +455,67 @@ class UserProfileDialog(QDialog):
 
         self.setLayout(layout)
 
+        for edit in (self.name_edit, self.phone_edit):
+            edit.textChanged.connect(self._update_dirty)
+        self.program_type_combo.currentIndexChanged.connect(self._update_dirty)
+        for check in (self.diet_check, self.training_check, self.coach_check, self.active_check, self.renew_check):
+            check.toggled.connect(self._update_dirty)
+
+    @timed('ui.UserProfileDialog.bind')
+    def bind(self, user):
+        """Show the given users row, discarding any unsaved edits."""
+        self.user = user
+        self.setWindowTitle(f"پروفایل: {user[1]}")
+        self._original = {
+            'name': user[1], 'phone': user[2], 'program_type': user[3],
+            'diet': bool(user[4]), 'training': bool(user[5]), 'coach': bool(user[6]), 'active': bool(user[9]),
+        }
+        self.name_edit.setText(user[1])
+        self.phone_edit.setText(user[2])
+        self.program_type_combo.setCurrentText('عادی' if user[3] == 'normal' else 'ویژه')
+        self.diet_check.setChecked(bool(user[4]))
+        self.training_check.setChecked(bool(user[5]))
+        self.coach_check.setChecked(bool(user[6]))
+        self.active_check.setChecked(bool(user[9]))
+        self.reg_label.setText(f"تاریخ ثبت‌نام: {to_jalali(user[7])}")
+        self.exp_label.setText(f"تاریخ انقضا: {to_jalali(user[8])}")
+        active_sub = is_subscription_active(user[8])
+        self.status_label.setText("فعال" if active_sub else "منقضی")
+        self.status_label.setStyleSheet("color: green;" if active_sub else "color: red;")
+        self.renew_check.setChecked(False)
+        self.renew_check.setEnabled(not active_sub)
+        self._update_dirty()
+        self.name_edit.setFocus()
+
+    def current_fields(self):
+        return {
+            'name': self.name_edit.text(),
+            'phone': self.phone_edit.text(),
+            'program_type': 'normal' if self.program_type_combo.currentText() == 'عادی' else 'vip',
+            'diet': self.diet_check.isChecked(),
+            'training': self.training_check.isChecked(),
+            'coach': self.coach_check.isChecked(),
+            'active': self.active_check.isChecked(),
+        }
+
+    def changed_fields(self):
+        """Fields whose widget value differs from the bound row."""
+        return {
+            field: value for field, value in self.current_fields().items()
+            if value != self._original.get(field)
+        }
+
+    def _update_dirty(self):
+        self.save_btn.setEnabled(bool(self.changed_fields()) or self.renew_check.isChecked())
+
     def save_changes(self):
-        program_type = 'normal' if self.program_type_combo.currentText() == 'عادی' else 'vip'
-        update_user(
-            self.user[0], self.name_edit.text(), self.phone_edit.text(),
-            program_type, self.diet_check.isChecked(),
-            self.training_check.isChecked(), self.coach_check.isChecked(),
-            self.active_check.isChecked()
-        )
+        fields = self.changed_fields()
+        try:
+            if fields:
+                update_user_fields(self.user[0], fields)
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "خطا", "این شماره تلفن برای کاربر دیگری ثبت شده است.")
+            return
         if self.renew_check.isChecked():
             renew_subscription(self.user[0])
         QMessageBox.information(self, "موفقیت", "کاربر به‌روزرسانی شد.")
@@ -348,6 +527,7 @@ class UserProfileDialog(QDialog):
             self.accept()
 
 class AddUserDialog(QDialog):
+    @timed('ui.AddUserDialog')
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("افزودن کاربر جدید")
@@ -468,15 +648,64 @@ class AddUserDialog(QDialog):
             QMessageBox.warning(self, "خطا", "نام و شماره تلفن الزامی است.")
             return
         program_type = 'normal' if self.program_type_combo.currentText() == 'عادی' else 'vip'
-        add_user(
-            name, phone, program_type,
-            self.diet_check.isChecked(), self.training_check.isChecked(),
-            self.coach_check.isChecked(), self.active_check.isChecked()
-        )
+        try:
+            add_user(
+                name, phone, program_type,
+                self.diet_check.isChecked(), self.training_check.isChecked(),
+                self.coach_check.isChecked(), self.active_check.isChecked()
+            )
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "خطا", "این شماره تلفن برای کاربر دیگری ثبت شده است.")
+            return
         QMessageBox.information(self, "موفقیت", "کاربر اضافه شد.")
         self.accept()
 
+class HomeWidget(QWidget):
+    users_requested = pyqtSignal()
+    reports_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        home_layout = QVBoxLayout(self)
+        home_layout.setSpacing(30)
+        home_label = QLabel("خوش آمدید به سیستم مدیریت باشگاه")
+        home_label.setFont(QFont("Arial", 500, QFont.Bold))
+        home_label.setAlignment(Qt.AlignCenter)
+        home_label.setStyleSheet("color: #2C3E50; margin: 40px; font-size: 40px; font-weight: bold;")
+        home_layout.addWidget(home_label)
+
+        manage_btn = QPushButton("مدیریت کاربران")
+        manage_btn.setFont(QFont("Arial", 30))
+        manage_btn.setMinimumHeight(80)
+        manage_btn.clicked.connect(self.users_requested)
+        manage_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        manage_btn.setMinimumWidth(400)
+        home_layout.addWidget(manage_btn, alignment=Qt.AlignCenter)
+
+        reports_btn = QPushButton("گزارش‌های ماهانه")
+        reports_btn.setFont(QFont("Arial", 30))
+        reports_btn.setMinimumHeight(80)
+        reports_btn.clicked.connect(self.reports_requested)
+        reports_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        reports_btn.setMinimumWidth(400)
+        home_layout.addWidget(reports_btn, alignment=Qt.AlignCenter)
+
+        # Add club logo
+        logo_label = QLabel()
+        pixmap = QPixmap(200, 200)  # Placeholder for logo
+        pixmap.fill(Qt.transparent)
+        logo_label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio))
+        logo_label.setAlignment(Qt.AlignCenter)
+        home_layout.addWidget(logo_label, alignment=Qt.AlignCenter)
+
+        home_layout.addStretch()
+
 class UsersManagementWidget(QWidget):
+    """Members table with search. Created once and kept alive between visits."""
+
+    SEARCH_DEBOUNCE_MS = 250
+    home_requested = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setLayoutDirection(Qt.RightToLeft)
@@ -484,6 +713,17 @@ class UsersManagementWidget(QWidget):
         layout.setSpacing(20)
         layout.setContentsMargins(20, 20, 20, 20)
 
+        # Searches run on a pool thread once typing pauses for SEARCH_DEBOUNCE_MS
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.refresh_table)
+        self._search_generation = 0
+        self._search_worker = None
+        self._data_version = None
+        self._change_seq = 0
+        self._profile_dialog = None
+
         # Create search container widget
         search_container = QWidget()
         search_container.setLayoutDirection(Qt.RightToLeft)
@@ -509,142 +749,295 @@ class UsersManagementWidget(QWidget):
         self.search_edit.setFont(QFont("Arial", 26))
         self.search_edit.setMinimumHeight(65)
         self.search_edit.setAlignment(Qt.AlignRight)
-        self.search_edit.textChanged.connect(self.refresh_table)
+        self.search_edit.textChanged.connect(self.search_timer.start)
         search_layout.addWidget(self.search_edit)
 
         layout.addWidget(search_container)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(10)
-        self.table.setHorizontalHeaderLabels([
-            "شناسه", "نام", "شماره", "نوع", "غذایی", "تمرینی", "مربی", "وضعیت کاربر", "وضعیت اشتراک", "انقضا"
-        ])
+        self.model = UsersTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table.verticalHeader().setDefaultSectionSize(70)
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.table.itemDoubleClicked.connect(self.open_profile)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.doubleClicked.connect(self.open_profile)
         self.table.setFont(QFont("Arial", 24))
         self.table.setLayoutDirection(Qt.RightToLeft)
+        checkbox_delegate = CheckBoxDelegate(self.table)
         for col in [4, 5, 6, 7]:
-            self.table.setItemDelegateForColumn(col, CheckBoxDelegate(self.table))
+            self.table.setItemDelegateForColumn(col, checkbox_delegate)
         layout.addWidget(self.table)
 
         self.refresh_table()
         self.setLayout(layout)
 
     def back_to_home(self):
-        main_window = self.window()
-        home_widget = QWidget()
-        home_layout = QVBoxLayout(home_widget)
-        home_label = QLabel("خوش آمدید به سیستم مدیریت باشگاه")
-        home_label.setFont(QFont("Arial", 500, QFont.Bold))
-        home_label.setAlignment(Qt.AlignCenter)
-        home_label.setStyleSheet("color: #2C3E50; margin: 40px; font-size: 40px; font-weight: bold;")
-        home_layout.addWidget(home_label)
-
-        manage_btn = QPushButton("مدیریت کاربران")
-        manage_btn.setFont(QFont("Arial", 30))
-        manage_btn.setMinimumHeight(80)
-        manage_btn.clicked.connect(main_window.show_users_management)
-        manage_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        manage_btn.setMinimumWidth(400)
-        home_layout.addWidget(manage_btn, alignment=Qt.AlignCenter)
-
-        # Add club logo
-        logo_label = QLabel()
-        pixmap = QPixmap(200, 200)  # Placeholder for logo
-        pixmap.fill(Qt.transparent)
-        logo_label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio))
-        logo_label.setAlignment(Qt.AlignCenter)
-        home_layout.addWidget(logo_label, alignment=Qt.AlignCenter)
-
-        home_layout.addStretch()
-        home_widget.setLayout(home_layout)
-        main_window.scroll.setWidget(home_widget)
+        self.home_requested.emit()
 
+    @timed('ui.refresh_table')
     def refresh_table(self):
+        self.search_timer.stop()
+        self._data_version = data_version()
+        self._change_seq = latest_change()
+        self._search_generation += 1
+        if self._search_worker is not None:
+            self._search_worker.cancel()
+            self._search_worker = None
         query = self.search_edit.text()
-        users = search_users(query) if query else get_all_users()
-        self.table.setRowCount(len(users))
-        for row, user in enumerate(users):
-            active_sub = is_subscription_active(user[8])
-            if not active_sub:
-                row_color = QColor(255, 180, 180)
-            else:
-                row_color = QColor(255, 255, 255)
-                
-            id_item = QTableWidgetItem(str(user[0]))
-            id_item.setTextAlignment(Qt.AlignCenter)
-            id_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 0, id_item)
-                
-            name_item = QTableWidgetItem(user[1])
-            name_item.setTextAlignment(Qt.AlignCenter)
-            name_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 1, name_item)
-                
-            phone_item = QTableWidgetItem(user[2])
-            phone_item.setTextAlignment(Qt.AlignCenter)
-            phone_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 2, phone_item)
-                
-            type_item = QTableWidgetItem('عادی' if user[3] == 'normal' else 'ویژه')
-            type_item.setTextAlignment(Qt.AlignCenter)
-            type_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 3, type_item)
-                
-            diet_item = QTableWidgetItem()
-            diet_item.setData(Qt.DisplayRole, bool(user[4]))
-            diet_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 4, diet_item)
-                
-            training_item = QTableWidgetItem()
-            training_item.setData(Qt.DisplayRole, bool(user[5]))
-            training_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 5, training_item)
-                
-            coach_item = QTableWidgetItem()
-            coach_item.setData(Qt.DisplayRole, bool(user[6]))
-            coach_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 6, coach_item)
-                
-            active_item = QTableWidgetItem()
-            active_item.setData(Qt.DisplayRole, bool(user[9]))
-            active_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row, 7, active_item)
-                
-            status_item = QTableWidgetItem("فعال" if active_sub else "منقضی")
-            status_item.setTextAlignment(Qt.AlignCenter)
-            status_item.setForeground(QColor("green") if active_sub else QColor("red"))
-            status_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 8, status_item)
-                
-            exp_date = to_jalali(user[8])
-            exp_item = QTableWidgetItem(exp_date)
-            exp_item.setTextAlignment(Qt.AlignCenter)
-            exp_item.setFont(QFont("Arial", 13, QFont.Bold))
-            self.table.setItem(row, 9, exp_item)
-                
-            for col in range(10):
-                if self.table.item(row, col):
-                    self.table.item(row, col).setBackground(row_color)
+        if not query:
+            self.model.set_query(query)
+            return
+        worker = SearchWorker(self._search_generation, query, time.perf_counter())
+        worker.signals.finished.connect(self.apply_search_results)
+        worker.signals.failed.connect(self.search_failed)
+        self._search_worker = worker
+        QThreadPool.globalInstance().start(worker)
+
+    def apply_search_results(self, generation, query, users, cursor, started):
+        if generation != self._search_generation:
+            return
+        self._search_worker = None
+        self.model.set_rows(query, users, cursor)
+        SEARCH_LATENCY.record(time.perf_counter() - started)
+
+    def search_failed(self, generation, message):
+        if generation != self._search_generation:
+            return
+        self._search_worker = None
+        QMessageBox.warning(self, "خطا", f"جستجو انجام نشد: {message}")
+
+    def refresh_if_changed(self):
+        """Patch the loaded rows if the database changed since they were read.
+
+        The users change feed names the members written since the last patch,
+        by this or any other process, so only those rows are re-read. A full
+        reload of the loaded rows is the fallback when the feed has a gap or
+        names more members than one batch.
+        """
+        version = data_version()
+        if version == self._data_version or self._search_worker is not None:
+            return
+        self._data_version = version
+        changes = get_changes_since(self._change_seq)
+        if changes is None or len(changes) == CHANGE_BATCH_SIZE:
+            self._change_seq = latest_change()
+            self.model.refresh()
+            return
+        if not changes:
+            return
+        self._change_seq = changes[-1][0]
+        user_ids = {user_id for _, user_id, _ in changes}
+        self.model.apply_changes(user_ids, get_users_by_ids(user_ids, self.model.query()))
 
     def add_user(self):
         dialog = AddUserDialog(self)
         if dialog.exec_():
-            self.refresh_table()
+            self.refresh_if_changed()
             self.window().update_user_stats()
 
-    def open_profile(self, item):
-        row = item.row()
-        user_id = int(self.table.item(row, 0).text())
-        user = get_user_by_id(user_id)
-        dialog = UserProfileDialog(user, self)
+    def open_profile(self, index):
+        # One editor is kept and rebound to the row the table already holds.
+        # Only edited fields are written, so a row read a moment ago cannot
+        # overwrite newer values of the fields left untouched.
+        if self._profile_dialog is None:
+            self._profile_dialog = UserProfileDialog(self)
+        dialog = self._profile_dialog
+        dialog.bind(self.model.user_at(index.row()))
         if dialog.exec_():
-            self.refresh_table()
+            self.refresh_if_changed()
             self.window().update_user_stats()
 
+class ReportsWidget(QWidget):
+    """Month-by-month figures for one Jalali year, read from the analytics rollups."""
+
+    MONTHS = [
+        "فروردین", "اردیبهشت", "خرداد", "تیر", "مرداد", "شهریور",
+        "مهر", "آبان", "آذر", "دی", "بهمن", "اسفند"
+    ]
+    COLUMNS = [
+        "ماه", "ثبت‌نام عادی", "ثبت‌نام ویژه", "تمدید عادی", "تمدید ویژه", "ریزش", "در انتظار تمدید",
+        "ماندگاری", "غذایی", "تمرینی", "مربی"
+    ]
+    FIELDS = [
+        'signups_normal', 'signups_vip', 'renewals_normal', 'renewals_vip', 'churned', 'due',
+        'retention', 'diet', 'training', 'coach'
+    ]
+    home_requested = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setLayoutDirection(Qt.RightToLeft)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(20)
+        layout.setContentsMargins(20, 20, 20, 20)
+        self._shown = None
+
+        controls = QHBoxLayout()
+        back_btn = QPushButton("بازگشت به صفحه اصلی")
+        back_btn.setFont(QFont("Arial", 26))
+        back_btn.setMinimumHeight(65)
+        back_btn.setMinimumWidth(280)
+        back_btn.clicked.connect(self.home_requested)
+        controls.addWidget(back_btn)
+
+        year_label = QLabel("سال:")
+        year_label.setFont(QFont("Arial", 26))
+        controls.addWidget(year_label)
+        self.year_spin = QSpinBox()
+        self.year_spin.setRange(1300, 1500)
+        self.year_spin.setValue(jalali_year(datetime.now().toordinal()))
+        self.year_spin.setFont(QFont("Arial", 26))
+        self.year_spin.setMinimumHeight(65)
+        self.year_spin.valueChanged.connect(self.refresh_if_changed)
+        controls.addWidget(self.year_spin)
+        controls.addStretch()
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(len(self.MONTHS), len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(50)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setFont(QFont("Arial", 18))
+        layout.addWidget(self.table)
+
+        self.refresh_if_changed()
+
+    def refresh_if_changed(self):
+        """Re-read the report if the year or any member changed since it was shown."""
+        shown = (self.year_spin.value(), latest_change(), datetime.now().toordinal())
+        if shown != self._shown:
+            self._shown = shown
+            self.refresh()
+
+    @timed('ui.ReportsWidget.refresh')
+    def refresh(self):
+        year = self.year_spin.value()
+        for row, month in enumerate(monthly_report(year)):
+            values = [f"{self.MONTHS[month['month'] - 1]} {year}"]
+            for field in self.FIELDS:
+                value = month[field]
+                if field == 'retention':
+                    values.append(f"{value:.0%}" if value is not None else "-")
+                else:
+                    values.append(str(value))
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setTextAlignment(Qt.AlignCenter)
+                self.table.setItem(row, col, item)
+
+class PerfPanel(QDialog):
+    """Hidden diagnostics panel (Ctrl+Shift+D) listing the gym_perf timings."""
+
+    COLUMNS = ["نام", "تعداد", "میانگین (ms)", "p95 (ms)", "بیشینه (ms)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("عیب‌یابی کارایی")
+        self.setMinimumSize(1000, 700)
+        self.setLayoutDirection(Qt.RightToLeft)
+
+        layout = QVBoxLayout(self)
+        self.enabled_check = QCheckBox("ثبت زمان‌ها")
+        self.enabled_check.setChecked(gym_perf.is_enabled())
+        self.enabled_check.toggled.connect(gym_perf.enable)
+        layout.addWidget(self.enabled_check)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setFont(QFont("Arial", 14))
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for text, slot in [("به‌روزرسانی", self.refresh), ("پاک کردن", self.reset),
+                           ("ذخیره در فایل", self.export), ("بستن", self.close)]:
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.refresh_timer.start(1000)
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        metrics = gym_perf.snapshot()
+        self.table.setRowCount(len(metrics))
+        for row, (name, summary) in enumerate(metrics.items()):
+            values = [
+                name, str(summary['count']), f"{summary['mean_ms']:.3f}",
+                f"{summary['p95_ms']:.3f}", f"{summary['max_ms']:.3f}"
+            ]
+            for col, value in enumerate(values):
+                self.table.setItem(row, col, QTableWidgetItem(value))
+
+    def reset(self):
+        gym_perf.reset()
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "ذخیره گزارش کارایی", "gym_perf.json", "JSON (*.json)")
+        if path:
+            gym_perf.export(path)
+
+class ExpiryScheduler(QObject):
+    """Deactivates lapsed subscriptions at the moment the next one ends.
+
+    One single-shot timer is armed for the earliest upcoming expiration_ts,
+    which the expiration indexes answer in a single lookup, so nothing is
+    polled. Call reschedule() when members change; other desks may have added
+    a member who expires sooner.
+    """
+
+    expired = pyqtSignal(int)
+    # The timer runs on a monotonic clock, so long waits are capped to notice
+    # wall-clock changes and wake-ups from sleep
+    MAX_WAIT_MS = 60 * 60 * 1000
+    RETRY_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.fire)
+        self.due = None
+
+    def reschedule(self, after_sweep=False):
+        now = time.time()
+        self.due = next_expiration(int(now))
+        if self.due is None:
+            self.timer.stop()
+            return
+        wait_ms = math.ceil((self.due - now) * 1000)
+        if wait_ms <= 0 and after_sweep:
+            # Still lapsed right after a sweep: the database clock (a remote
+            # server's) is behind ours, so try again shortly instead of spinning
+            wait_ms = self.RETRY_MS
+        self.timer.start(min(max(wait_ms, 0), self.MAX_WAIT_MS))
+
+    @timed('ui.ExpiryScheduler.fire')
+    def fire(self):
+        expired = expire_lapsed_users()
+        self.expired.emit(expired)
+        self.reschedule(after_sweep=True)
+        return expired
+
+class BackupSignals(QObject):
+    finished = pyqtSignal(object, object)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -683,45 +1076,49 @@ class MainWindow(QMainWindow):
         self.header_frame.setLayout(header_layout)
         self.header_frame.setStyleSheet("background-color: #2C3E50; padding: 20px; border-radius: 10px;")
 
+        self._stats_seq = None
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.update_datetime)
         self.timer.start(1000)
 
+        # Lapsed subscriptions are deactivated in the database as they end
+        self.expiry_scheduler = ExpiryScheduler(self)
+        self.expiry_scheduler.expired.connect(self.on_subscriptions_expired)
+
+        self._perf_panel = None
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, self.show_perf_panel)
+
+        # A local database is snapshotted once a day on a background thread;
+        # in client mode the server PC takes care of its own backups
+        self.backup_signals = BackupSignals(self)
+        self.backup_signals.finished.connect(self.on_backup_finished)
+        self.backup_service = None
+        repository = get_repository()
+        if isinstance(repository, UserRepository):
+            self.backup_service = gym_backup.BackupService(
+                repository.db_name, on_finished=self.backup_signals.finished.emit
+            )
+            self.backup_service.start()
+            QShortcut(QKeySequence("Ctrl+Shift+B"), self, self.backup_service.backup_now)
+
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         main_layout = QVBoxLayout(central_widget)
         main_layout.addWidget(self.header_frame)
 
-        home_widget = QWidget()
-        home_layout = QVBoxLayout(home_widget)
-        home_label = QLabel("خوش آمدید به سیستم مدیریت باشگاه")
-        home_label.setFont(QFont("Arial", 500, QFont.Bold))
-        home_label.setAlignment(Qt.AlignCenter)
-        home_label.setStyleSheet("color: #2C3E50; margin: 40px; font-size: 40px; font-weight: bold;")
-        home_layout.addWidget(home_label)
-
-        manage_btn = QPushButton("مدیریت کاربران")
-        manage_btn.setFont(QFont("Arial", 30))
-        manage_btn.setMinimumHeight(80)
-        manage_btn.clicked.connect(self.show_users_management)
-        manage_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        manage_btn.setMinimumWidth(400)
-        home_layout.addWidget(manage_btn, alignment=Qt.AlignCenter)
-
-        # Add club logo
-        logo_label = QLabel()
-        pixmap = QPixmap(200, 200)  # Placeholder for logo
-        pixmap.fill(Qt.transparent)
-        logo_label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio))
-        logo_label.setAlignment(Qt.AlignCenter)
-        home_layout.addWidget(logo_label, alignment=Qt.AlignCenter)
-
-        home_layout.addStretch()
-        home_widget.setLayout(home_layout)
+        # Screens are created once and kept, so switching back to one is
+        # instant and it keeps its search text, scroll position and rows
+        self.screens = QStackedWidget()
+        self.home_widget = HomeWidget()
+        self.home_widget.users_requested.connect(self.show_users_management)
+        self.home_widget.reports_requested.connect(self.show_reports)
+        self.screens.addWidget(self.home_widget)
+        self.users_widget = None
+        self.reports_widget = None
 
         self.scroll = QScrollArea()
         self.scroll.setWidgetResizable(True)
-        self.scroll.setWidget(home_widget)
+        self.scroll.setWidget(self.screens)
         main_layout.addWidget(self.scroll)
 
         app.setStyle("Fusion")
@@ -760,7 +1157,7 @@ class MainWindow(QMainWindow):
             QLineEdit:focus, QComboBox:focus {
                 border: 2px solid #3498DB;
             }
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 alternate-background-color: #F8F9FA;
                 gridline-color: #BDC3C7;
@@ -771,7 +1168,7 @@ class MainWindow(QMainWindow):
                 border: 2px solid #BDC3C7;
                 border-radius: 8px;
             }
-            QTableWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #AED6F1;
             }
             QHeaderView::section {
@@ -812,25 +1209,87 @@ class MainWindow(QMainWindow):
         """)
 
         main_layout.setContentsMargins(25, 25, 25, 25)
-        home_layout.setSpacing(30)
 
+        self.expiry_scheduler.fire()
         self.update_user_stats()
 
+    def on_backup_finished(self, path, error):
+        if error:
+            self.statusBar().showMessage(f"پشتیبان‌گیری ناموفق بود: {error}", 30000)
+        else:
+            self.statusBar().showMessage(f"نسخه پشتیبان ذخیره شد: {os.path.basename(path)}", 10000)
+
+    def closeEvent(self, event):
+        if self.backup_service is not None:
+            # Cancels a snapshot in progress; its partial file is discarded
+            self.backup_service.close()
+        super().closeEvent(event)
+
+    def show_perf_panel(self):
+        if self._perf_panel is None:
+            self._perf_panel = PerfPanel(self)
+        self._perf_panel.show()
+        self._perf_panel.raise_()
+
+    def on_subscriptions_expired(self, expired):
+        if expired:
+            self.statusBar().showMessage(f"اشتراک {expired} کاربر منقضی شد", 10000)
+            self.update_user_stats()
+        if self.users_widget is not None:
+            # Members already marked inactive have no row change to patch, but
+            # their subscription column still turns red
+            self.users_widget.model.refresh_expired()
+            if expired and self.screens.currentWidget() is self.users_widget:
+                self.users_widget.refresh_if_changed()
+
     def update_datetime(self):
         self.datetime_label.setText(get_current_jalali_date_time())
-        self.update_user_stats()
+        # The counters only move when members change, so check-ins and other
+        # writes do not cost a stats query
+        if latest_change() != self._stats_seq:
+            self.update_user_stats()
+            self.expiry_scheduler.reschedule()
+            # Rows written by other desks or processes are patched in as they change
+            if self.users_widget is not None and self.screens.currentWidget() is self.users_widget:
+                self.users_widget.refresh_if_changed()
 
     def update_user_stats(self):
+        self._stats_seq = latest_change()
         total, active, inactive = get_user_stats()
         self.total_users_label.setText(f"تعداد کل کاربران: {total}")
         self.active_users_label.setText(f"کاربران فعال: {active}")
         self.inactive_users_label.setText(f"کاربران غیرفعال: {inactive}")
 
+    def show_home(self):
+        self.screens.setCurrentWidget(self.home_widget)
+
     def show_users_management(self):
-        users_widget = UsersManagementWidget()
-        self.scroll.setWidget(users_widget)
+        if self.users_widget is None:
+            self.users_widget = UsersManagementWidget()
+            self.users_widget.home_requested.connect(self.show_home)
+            self.screens.addWidget(self.users_widget)
+        else:
+            self.users_widget.refresh_if_changed()
+        self.screens.setCurrentWidget(self.users_widget)
+
+    def show_reports(self):
+        if self.reports_widget is None:
+            self.reports_widget = ReportsWidget()
+            self.reports_widget.home_requested.connect(self.show_home)
+            self.screens.addWidget(self.reports_widget)
+        else:
+            self.reports_widget.refresh_if_changed()
+        self.screens.setCurrentWidget(self.reports_widget)
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+        # Subcommands are handled by the headless CLI, e.g. "python gym.py import members.csv"
+        import gym_cli
+        sys.exit(gym_cli.main(sys.argv[1:]))
+    if os.environ.get('GYM_SERVER'):
+        # Client mode: another PC runs gym_server.py and owns the database
+        from gym_server import RemoteRepository
+        set_repository(RemoteRepository(os.environ['GYM_SERVER']))
     init_db()
     app = QApplication(sys.argv)
     
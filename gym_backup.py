@@ -0,0 +1,269 @@
+"""Online backups of the gym database through SQLite's backup API.
+
+A backup is taken while the desk keeps working: the copy runs on its own
+connection inside one read transaction, so it sees a single consistent
+snapshot and writers are never blocked. Pages are copied in small steps
+with a pause between them so the disk is not saturated. Each finished copy
+is integrity-checked before it replaces its .partial name, and only the
+newest few snapshots are kept:
+
+    python gym_cli.py backup                    # one snapshot into backups/ next to the database
+    python gym_cli.py backup --every 86400      # keep taking one a day
+    python gym_cli.py check backups/gym_management-20250101-030000-000000.db
+    python gym_cli.py restore backups/gym_management-20250101-030000-000000.db
+
+Restoring also goes through the backup API, into the live database, so other
+connections see the restored contents as one committed write. The current
+contents are snapshotted first, and the snapshot's change feed is replaced by
+a reset entry numbered past the live one, so open desks reload.
+"""
+import glob
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import gym_core
+from gym_perf import timed
+
+BACKUP_DIR = 'backups'
+BACKUP_KEEP = 7
+BACKUP_INTERVAL = 24 * 60 * 60
+# Pages copied per step (about 1 MB with 4 KB pages) and the pause after each
+BACKUP_PAGES = 256
+BACKUP_PAUSE = 0.005
+# Virtual machine steps between polls of cancelled() during an integrity check,
+# and how long closing the service waits for a backup to stop
+CHECK_POLL_STEPS = 10000
+CLOSE_TIMEOUT = 5.0
+
+class BackupError(Exception):
+    """A backup or restore could not be completed, or a file failed its integrity check."""
+
+def _stem(db_name):
+    return os.path.splitext(os.path.basename(db_name))[0]
+
+def default_backup_dir(db_name=gym_core.DB_NAME):
+    """The backups directory next to db_name."""
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), BACKUP_DIR)
+
+def list_backups(db_name=gym_core.DB_NAME, backup_dir=None):
+    """Snapshots of db_name in backup_dir (default: next to it), oldest first."""
+    backup_dir = backup_dir or default_backup_dir(db_name)
+    return sorted(glob.glob(os.path.join(backup_dir, f"{glob.escape(_stem(db_name))}-*.db")))
+
+def check_database(path, cancelled=None):
+    """Problems PRAGMA integrity_check reports for path; an empty list means it is sound.
+
+    cancelled() is polled while the check runs; once it returns true the
+    check is abandoned with BackupError.
+    """
+    if not os.path.exists(path):
+        return [f"{path} does not exist"]
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            if cancelled is not None:
+                conn.set_progress_handler(cancelled, CHECK_POLL_STEPS)
+            problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as exc:
+        if cancelled is not None and cancelled():
+            raise BackupError(f"check of {path} cancelled") from None
+        return [str(exc)]
+    return [] if problems == ['ok'] else problems
+
+def copy_database(source, target, pages=BACKUP_PAGES, pause=BACKUP_PAUSE, progress=None):
+    """Copy source into target with the backup API in throttled steps.
+
+    source is read inside one transaction, so the copy is a consistent
+    snapshot even while other connections keep writing; without it every
+    write would restart the backup from the first page.
+    """
+    def step(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+        if pause:
+            time.sleep(pause)
+
+    source.execute('BEGIN')
+    try:
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages, progress=step)
+    finally:
+        source.execute('COMMIT')
+
+@timed('backup.backup_database')
+def backup_database(db_name=gym_core.DB_NAME, backup_dir=None, keep=BACKUP_KEEP,
+                    pages=BACKUP_PAGES, pause=BACKUP_PAUSE, progress=None, cancelled=None):
+    """Write a checked snapshot of db_name into backup_dir and prune old ones; returns its path.
+
+    progress(copied, total) is called after each step of the copy and may
+    raise to abandon it; cancelled is passed on to check_database().
+    """
+    backup_dir = backup_dir or default_backup_dir(db_name)
+    os.makedirs(backup_dir, exist_ok=True)
+    path = os.path.join(backup_dir, f"{_stem(db_name)}-{datetime.now():%Y%m%d-%H%M%S-%f}.db")
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    source = sqlite3.connect(db_name, timeout=gym_core.BUSY_TIMEOUT, isolation_level=None)
+    try:
+        target = sqlite3.connect(partial)
+        try:
+            copy_database(source, target, pages, pause, progress)
+            # A snapshot is a single self-contained file
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        source.close()
+    try:
+        problems = check_database(partial, cancelled)
+    except BackupError:
+        os.remove(partial)
+        raise
+    if problems:
+        os.remove(partial)
+        raise BackupError(f"backup of {db_name} failed its integrity check: {problems[0]}")
+    os.replace(partial, path)
+    for old in list_backups(db_name, backup_dir)[:-keep] if keep else []:
+        os.remove(old)
+    return path
+
+def _has_change_feed(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_changes'").fetchone() is not None
+
+@timed('backup.restore_database')
+def restore_database(path, db_name=gym_core.DB_NAME, backup_dir=None, pages=BACKUP_PAGES):
+    """Replace the contents of db_name with the snapshot at path.
+
+    The snapshot is checked first and the current contents are backed up
+    (without pruning) so a restore can be undone. Returns that safety copy's
+    path, or None if db_name did not exist yet.
+    """
+    problems = check_database(path)
+    if problems:
+        raise BackupError(f"{path} failed its integrity check: {problems[0]}")
+    safety = None
+    if os.path.exists(db_name):
+        safety = backup_database(db_name, backup_dir, keep=0, pages=pages, pause=0)
+    # The snapshot is staged in a scratch copy so its change feed can be
+    # renumbered before it becomes visible in db_name
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(db_name))) as scratch:
+        staged = sqlite3.connect(os.path.join(scratch, 'restore.db'), isolation_level=None)
+        try:
+            source = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
+            try:
+                copy_database(source, staged, pages, pause=0)
+            finally:
+                source.close()
+            target = sqlite3.connect(db_name, timeout=gym_core.BUSY_TIMEOUT, isolation_level=None)
+            try:
+                if _has_change_feed(staged):
+                    floor = 0
+                    if _has_change_feed(target):
+                        floor = target.execute('SELECT COALESCE(MAX(seq), 0) FROM user_changes').fetchone()[0]
+                    staged.execute('BEGIN')
+                    gym_core.reset_change_feed(staged, floor)
+                    staged.execute('COMMIT')
+                copy_database(staged, target, pages, pause=0)
+            finally:
+                target.close()
+        finally:
+            staged.close()
+    # Snapshots from older versions are brought up to the current schema
+    repository = gym_core.UserRepository(db_name)
+    try:
+        gym_core.migrate(repository.connection())
+    finally:
+        repository.close()
+    return safety
+
+def last_backup_time(db_name=gym_core.DB_NAME, backup_dir=None):
+    backups = list_backups(db_name, backup_dir)
+    return os.path.getmtime(backups[-1]) if backups else None
+
+class BackupService:
+    """Takes a snapshot every interval seconds on a daemon thread.
+
+    The first one is taken at start() if the newest snapshot is older than
+    interval. on_finished(path, error) is called from the backup thread after
+    every attempt, with error set to the exception's message on failure.
+    """
+
+    def __init__(self, db_name=gym_core.DB_NAME, backup_dir=None, interval=BACKUP_INTERVAL,
+                 keep=BACKUP_KEEP, on_finished=None):
+        self.db_name = db_name
+        self.backup_dir = backup_dir
+        self.interval = interval
+        self.keep = keep
+        self.on_finished = on_finished
+        self._wakeup = threading.Event()
+        self._force = False
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='gym-backup', daemon=True)
+            self._thread.start()
+
+    def backup_now(self):
+        """Take a snapshot as soon as the thread is free, without waiting for it."""
+        self._force = True
+        self._wakeup.set()
+
+    def _due_in(self):
+        last = last_backup_time(self.db_name, self.backup_dir)
+        return 0 if last is None else max(0, last + self.interval - time.time())
+
+    def _check_closed(self, copied, total):
+        if self._closed:
+            raise BackupError("backup cancelled")
+
+    def _is_closed(self):
+        return self._closed
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self._due_in())
+            self._wakeup.clear()
+            if self._closed:
+                break
+            if not self._force and self._due_in() > 0:
+                continue
+            self._force = False
+            try:
+                path = backup_database(self.db_name, self.backup_dir, self.keep, progress=self._check_closed,
+                                       cancelled=self._is_closed)
+                error = None
+            except Exception as exc:
+                # Any failure is reported; the thread keeps the schedule going
+                path, error = None, str(exc) or type(exc).__name__
+            if self._closed:
+                break
+            if self.on_finished is not None:
+                self.on_finished(path, error)
+            if error:
+                # Try again after a while instead of immediately
+                self._wakeup.wait(min(self.interval, 15 * 60))
+
+    def close(self):
+        """Stop the thread, abandoning a backup in progress.
+
+        Waits at most CLOSE_TIMEOUT seconds; the thread is a daemon, so a
+        step that is slow to notice cannot keep the application open.
+        """
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(CLOSE_TIMEOUT)
+            self._thread = None
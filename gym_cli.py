@@ -0,0 +1,367 @@
+"""Command line interface for scripted gym management jobs.
+
+Only gym_core is imported here, never Qt, so a renewal or import job starts
+without loading the GUI stack:
+
+    python gym_cli.py add "Ali Rezaei" 09121234567 --vip --diet
+    python gym_cli.py renew 42
+    python gym_cli.py search rezaei
+    python gym_cli.py list --order expiration --limit 50 [--cursor TOKEN]
+    python gym_cli.py stats
+    python gym_cli.py expire
+    python gym_cli.py import members.csv --rejects rejected.jsonl
+    python gym_cli.py export members.jsonl
+    python gym_cli.py checkin 42 --phone "+98 912 123 4567"
+    python gym_cli.py lookup ۰۹۱۲۱۲۳۴۵۶۷
+    python gym_cli.py visits 42
+    python gym_cli.py peak-hours --days 30
+    python gym_cli.py changes --since 1200 --every 2
+    python gym_cli.py report --year 1404
+    python gym_cli.py rebuild-analytics
+    python gym_cli.py serve --host 0.0.0.0
+    python gym_cli.py backup --every 86400
+    python gym_cli.py check
+    python gym_cli.py restore backups/gym_management-20250101-030000-000000.db
+
+With --server URL (or GYM_SERVER=URL in the environment) every command goes
+through a running gym_server instead of opening the database file.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import gym_core
+
+def cmd_add(args):
+    program_type = 'vip' if args.vip else 'normal'
+    try:
+        user_id = gym_core.add_user(
+            args.name, args.phone, program_type, args.diet, args.training, args.coach, not args.inactive
+        )
+    except sqlite3.IntegrityError:
+        other = gym_core.find_user_by_phone(args.phone)
+        owner = f"member {other[0]} ({other[1]})" if other else "another member"
+        print(f"error: phone {args.phone} is already registered to {owner}", file=sys.stderr)
+        return 1
+    print(user_id)
+    return 0
+
+def cmd_renew(args):
+    status = 0
+    for user_id in args.user_ids:
+        if gym_core.get_user_by_id(user_id) is None:
+            print(f"no member with id {user_id}", file=sys.stderr)
+            status = 1
+            continue
+        gym_core.renew_subscription(user_id)
+        user = gym_core.get_user_by_id(user_id)
+        print(f"{user_id}\t{user[1]}\t{gym_core.to_jalali(user[8])}")
+    return status
+
+def print_users(users):
+    expiration_dates = gym_core.to_jalali_batch([user[8] for user in users])
+    for user, exp_date in zip(users, expiration_dates):
+        status = 'active' if gym_core.is_subscription_active(user[8]) else 'expired'
+        print(f"{user[0]}\t{user[1]}\t{user[2]}\t{user[3]}\t{exp_date}\t{status}")
+
+def cmd_search(args):
+    print_users(gym_core.fetch_users_page(args.query, 0, args.limit))
+    return 0
+
+def cmd_list(args):
+    try:
+        users, cursor = gym_core.list_users(args.query, args.order, args.cursor, args.limit)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    print_users(users)
+    if cursor:
+        print(f"next: --cursor {cursor}", file=sys.stderr)
+    return 0
+
+def cmd_stats(args):
+    total, active, inactive = gym_core.get_user_stats()
+    print(f"total\t{total}\nactive\t{active}\ninactive\t{inactive}")
+    return 0
+
+def cmd_expire(args):
+    while True:
+        expired = gym_core.expire_lapsed_users()
+        print(f"{datetime.now().isoformat(timespec='seconds')}\texpired {expired} members", flush=True)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+def cmd_import(args):
+    rejects = open(args.rejects, 'w', encoding='utf-8') if args.rejects else None
+
+    def on_reject(line_number, record, reason):
+        if rejects:
+            rejects.write(json.dumps({'line': line_number, 'reason': reason, 'record': record}, ensure_ascii=False) + '\n')
+        else:
+            print(f"line {line_number}: {reason}", file=sys.stderr)
+
+    def progress(inserted, rejected):
+        print(f"\r{inserted} imported, {rejected} rejected", end='', file=sys.stderr, flush=True)
+
+    try:
+        inserted, rejected = gym_core.import_users(args.path, args.format, args.batch_size, progress, on_reject)
+    finally:
+        if rejects:
+            rejects.close()
+    print(file=sys.stderr)
+    print(f"imported {inserted} members, rejected {rejected}")
+    return 0
+
+def cmd_export(args):
+    written = gym_core.export_users(args.path, args.format, args.chunk_size)
+    print(f"exported {written} members to {args.path}")
+    return 0
+
+def cmd_checkin(args):
+    buffer = gym_core.AttendanceBuffer()
+    try:
+        statuses = [(user_id, buffer.check_in(user_id)) for user_id in args.user_ids]
+        statuses += [(phone, buffer.check_in_phone(phone)) for phone in args.phones]
+    finally:
+        buffer.close()
+    for user_id, status in statuses:
+        print(f"{user_id}\t{status}")
+    return 0 if all(status == gym_core.CHECKIN_OK for _, status in statuses) else 1
+
+def cmd_lookup(args):
+    found = 0
+    for phone in args.phones:
+        user = gym_core.find_user_by_phone(phone)
+        if user is None:
+            print(f"{phone}\tnot found", file=sys.stderr)
+            continue
+        found += 1
+        print_users([user])
+    return 0 if found == len(args.phones) else 1
+
+def cmd_renormalize_phones(args):
+    duplicates = gym_core.renormalize_phones()
+    for user_id in duplicates:
+        print(f"{user_id}\tduplicate phone, not indexed")
+    print(f"normalized phones, {len(duplicates)} duplicates", file=sys.stderr)
+    return 0
+
+def cmd_visits(args):
+    for user_id in args.user_ids:
+        print(f"{user_id}\t{gym_core.visits_this_month(user_id)}")
+    return 0
+
+def cmd_peak_hours(args):
+    today = datetime.now().toordinal()
+    counts = gym_core.hourly_visits(today - args.days + 1, today)
+    widest = max(counts) or 1
+    for hour, visits in enumerate(counts):
+        print(f"{hour:02d}:00\t{visits}\t{'#' * round(40 * visits / widest)}")
+    return 0
+
+def cmd_changes(args):
+    seq = args.since if args.since is not None else gym_core.latest_change()
+    while True:
+        changes = gym_core.get_changes_since(seq)
+        if changes is None:
+            print(f"changes after {seq} were pruned; reload everything", file=sys.stderr)
+            return 1
+        for seq, user_id, op in changes:
+            print(f"{seq}\t{user_id}\t{op}", flush=True)
+        if len(changes) == gym_core.CHANGE_BATCH_SIZE:
+            continue
+        if not args.every:
+            print(f"latest change {seq}", file=sys.stderr)
+            return 0
+        time.sleep(args.every)
+
+def cmd_report(args):
+    year = args.year or gym_core.jalali_year(datetime.now().toordinal())
+    columns = ('month',) + gym_core.REPORT_FIELDS + ('retention',)
+    print('\t'.join(columns))
+    for row in gym_core.monthly_report(year):
+        retention = f"{row['retention']:.0%}" if row['retention'] is not None else '-'
+        print('\t'.join([f"{year}/{row['month']:02d}"] + [str(row[field]) for field in gym_core.REPORT_FIELDS] + [retention]))
+    return 0
+
+def cmd_rebuild_analytics(args):
+    start = time.perf_counter()
+    gym_core.rebuild_analytics()
+    print(f"rebuilt signup and expiration rollups in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return 0
+
+def cmd_backup(args):
+    import gym_backup
+    if args.list:
+        for path in gym_backup.list_backups(args.db, args.dir):
+            print(f"{path}\t{os.path.getsize(path)}")
+        return 0
+    while True:
+        start = time.perf_counter()
+        path = gym_backup.backup_database(args.db, args.dir, args.keep)
+        print(f"{datetime.now().isoformat(timespec='seconds')}\t{path}\t{time.perf_counter() - start:.1f} s", flush=True)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+def cmd_check(args):
+    import gym_backup
+    failed = 0
+    for path in args.paths or [args.db]:
+        problems = gym_backup.check_database(path)
+        failed += bool(problems)
+        for problem in problems or ['ok']:
+            print(f"{path}\t{problem}")
+    return 1 if failed else 0
+
+def cmd_restore(args):
+    import gym_backup
+    try:
+        safety = gym_backup.restore_database(args.path, args.db, args.dir)
+    except gym_backup.BackupError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    if safety:
+        print(f"previous contents saved to {safety}", file=sys.stderr)
+    print(f"restored {args.db} from {args.path}", file=sys.stderr)
+    return 0
+
+def cmd_serve(args):
+    import gym_server
+    return gym_server.serve(args.db, args.host, args.port, args.readers)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='gym_cli.py', description="Gym users management from the command line.")
+    parser.add_argument('--db', default=gym_core.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument('--busy-timeout', type=float, default=gym_core.BUSY_TIMEOUT,
+                        help="seconds to wait for another writer before retrying (default: %(default)s)")
+    parser.add_argument('--server', default=os.environ.get('GYM_SERVER'), help="URL of a gym_server to use instead of --db")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="add a member with a 30-day subscription")
+    add.add_argument('name')
+    add.add_argument('phone')
+    add.add_argument('--vip', action='store_true')
+    add.add_argument('--diet', action='store_true')
+    add.add_argument('--training', action='store_true')
+    add.add_argument('--coach', action='store_true')
+    add.add_argument('--inactive', action='store_true')
+    add.set_defaults(func=cmd_add)
+
+    renew = commands.add_parser('renew', help="renew subscriptions for 30 days")
+    renew.add_argument('user_ids', type=int, nargs='+', metavar='id')
+    renew.set_defaults(func=cmd_renew)
+
+    search = commands.add_parser('search', help="find members by name or phone")
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=gym_core.PAGE_SIZE)
+    search.set_defaults(func=cmd_search)
+
+    list_ = commands.add_parser('list', help="page through members in id or expiration order")
+    list_.add_argument('--order', choices=gym_core.USER_ORDERS, default='id')
+    list_.add_argument('--query', default='', help="only members whose name or phone matches")
+    list_.add_argument('--cursor', help="token printed by the previous page")
+    list_.add_argument('--limit', type=int, default=gym_core.PAGE_SIZE)
+    list_.set_defaults(func=cmd_list)
+
+    stats = commands.add_parser('stats', help="print member counts")
+    stats.set_defaults(func=cmd_stats)
+
+    expire = commands.add_parser('expire', help="deactivate members whose subscription has lapsed")
+    expire.add_argument('--every', type=float, metavar='SECONDS', help="keep running, sweeping at this interval")
+    expire.set_defaults(func=cmd_expire)
+
+    import_ = commands.add_parser('import', help="bulk import members from CSV or JSONL")
+    import_.add_argument('path')
+    import_.add_argument('--format', choices=['csv', 'jsonl'])
+    import_.add_argument('--batch-size', type=int, default=gym_core.IMPORT_BATCH_SIZE)
+    import_.add_argument('--rejects', help="write rejected rows to this JSONL file")
+    import_.set_defaults(func=cmd_import)
+
+    export = commands.add_parser('export', help="export members to CSV or JSONL")
+    export.add_argument('path')
+    export.add_argument('--format', choices=['csv', 'jsonl'])
+    export.add_argument('--chunk-size', type=int, default=gym_core.EXPORT_CHUNK_SIZE)
+    export.set_defaults(func=cmd_export)
+
+    checkin = commands.add_parser('checkin', help="check members in if their subscription is current")
+    checkin.add_argument('user_ids', type=int, nargs='*', metavar='id')
+    checkin.add_argument('--phone', dest='phones', action='append', default=[], help="check in by phone number")
+    checkin.set_defaults(func=cmd_checkin)
+
+    lookup = commands.add_parser('lookup', help="find members by exact phone number in any digits or prefix form")
+    lookup.add_argument('phones', nargs='+', metavar='phone')
+    lookup.set_defaults(func=cmd_lookup)
+
+    renormalize = commands.add_parser('renormalize-phones', help="recompute normalized phones for every member")
+    renormalize.set_defaults(func=cmd_renormalize_phones)
+
+    visits = commands.add_parser('visits', help="print visits in the current Jalali month")
+    visits.add_argument('user_ids', type=int, nargs='+', metavar='id')
+    visits.set_defaults(func=cmd_visits)
+
+    peak_hours = commands.add_parser('peak-hours', help="print check-ins per hour of the day")
+    peak_hours.add_argument('--days', type=int, default=30, help="days to look back (default: %(default)s)")
+    peak_hours.set_defaults(func=cmd_peak_hours)
+
+    changes = commands.add_parser('changes', help="print members added, updated or deleted after a change number")
+    changes.add_argument('--since', type=int, help="last change number already seen (default: the latest)")
+    changes.add_argument('--every', type=float, metavar='SECONDS', help="keep running, polling at this interval")
+    changes.set_defaults(func=cmd_changes)
+
+    report = commands.add_parser('report', help="print signups, renewals, churn and add-on uptake per Jalali month")
+    report.add_argument('--year', type=int, help="Jalali year (default: the current one)")
+    report.set_defaults(func=cmd_report)
+
+    rebuild = commands.add_parser('rebuild-analytics', help="recompute the report rollups from the members table")
+    rebuild.set_defaults(func=cmd_rebuild_analytics)
+
+    backup = commands.add_parser('backup', help="snapshot the database while it stays in use")
+    backup.add_argument('--dir', help="snapshot directory (default: backups next to --db)")
+    backup.add_argument('--keep', type=int, default=7, help="newest snapshots to keep (default: %(default)s)")
+    backup.add_argument('--every', type=float, metavar='SECONDS', help="keep running, taking a snapshot at this interval")
+    backup.add_argument('--list', action='store_true', help="list the snapshots instead of taking one")
+    backup.set_defaults(func=cmd_backup)
+
+    check = commands.add_parser('check', help="run SQLite's integrity check on the database or on snapshots")
+    check.add_argument('paths', nargs='*', metavar='path', help="files to check (default: --db)")
+    check.set_defaults(func=cmd_check)
+
+    restore = commands.add_parser('restore', help="replace the database contents with a snapshot")
+    restore.add_argument('path')
+    restore.add_argument('--dir', help="where to save the current contents first (default: backups next to --db)")
+    restore.set_defaults(func=cmd_restore)
+
+    serve = commands.add_parser('serve', help="share the database with other PCs over HTTP")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on (default: %(default)s)")
+    serve.add_argument('--port', type=int, default=8765)
+    serve.add_argument('--readers', type=int, default=4, help="threads serving reads concurrently")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.func in (cmd_backup, cmd_check, cmd_restore):
+        # These work on the database file itself, so they run on the PC that has it
+        if args.server:
+            print(f"{args.command} needs the database file; run it on the server PC", file=sys.stderr)
+            return 2
+        return args.func(args)
+    if args.func is cmd_serve:
+        return cmd_serve(args)
+    if args.server:
+        import gym_server
+        gym_core.set_repository(gym_server.RemoteRepository(args.server))
+    else:
+        gym_core.set_repository(gym_core.UserRepository(args.db, busy_timeout=args.busy_timeout))
+    gym_core.init_db()
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1623 @@
+"""Headless data layer and date helpers for the gym management app.
+
+Nothing here imports Qt, and jdatetime is only imported when a Jalali
+conversion is actually needed, so scripts and the CLI start quickly.
+"""
+import base64
+import bisect
+import csv
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import date, datetime, timedelta
+
+from gym_perf import timed
+
+logger = logging.getLogger(__name__)
+
+# Database setup
+DB_NAME = 'gym_management.db'
+
+PAGE_SIZE = 200
+
+# Concurrency: seconds SQLite waits for a lock, extra attempts at taking the
+# write lock (with exponential backoff) after that, and how often the
+# background thread checkpoints the write-ahead log
+BUSY_TIMEOUT = 5.0
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.05
+CHECKPOINT_INTERVAL = 1.0
+WAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Change feed: entries returned per get_changes_since() call, and how many of
+# the newest entries survive the prune at startup
+CHANGE_BATCH_SIZE = 1000
+CHANGE_LOG_KEEP = 100000
+# op of the entry that marks the whole table as replaced (after a restore)
+CHANGE_RESET = 'reset'
+
+INSERT_USER_SQL = '''
+    INSERT INTO users (name, phone, program_type, diet, training, coach, registration_date, expiration_date, active,
+                       registration_ts, expiration_ts, phone_normalized)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Columns the profile editor may write one at a time
+EDITABLE_FIELDS = ('name', 'phone', 'program_type', 'diet', 'training', 'coach', 'active')
+FLAG_FIELDS = {'diet', 'training', 'coach', 'active'}
+
+def to_epoch(dt):
+    """Unix seconds for a naive local datetime, matching the *_ts columns."""
+    return int(dt.timestamp())
+
+class UserRepository:
+    """Data access for the users table over persistent, per-thread connections.
+
+    Each thread gets one sqlite3 connection that stays open for the life of the
+    repository, so repeated calls reuse it together with its prepared statement
+    cache instead of reconnecting and re-parsing the SQL every time.
+
+    Concurrency guarantee: init_schema() switches the database to WAL mode.
+    After that, any number of threads and processes can read while one of
+    them writes. A read never waits for a writer and never sees a transaction
+    half-applied. Writes are serialized. Each transaction() is atomic and
+    takes the write lock up front. If another writer holds the lock, it waits
+    up to busy_timeout seconds and then retries busy_retries more times with
+    backoff. Only then does it raise sqlite3.OperationalError("database is
+    locked"). A background thread checkpoints the log every
+    checkpoint_interval seconds (0 leaves it to SQLite's auto-checkpoint), so
+    commits do not pay for checkpointing.
+    """
+
+    def __init__(self, db_name=DB_NAME, cached_statements=256, busy_timeout=BUSY_TIMEOUT,
+                 busy_retries=BUSY_RETRIES, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.db_name = db_name
+        self.cached_statements = cached_statements
+        self.busy_timeout = busy_timeout
+        self.busy_retries = busy_retries
+        self.checkpoint_interval = checkpoint_interval
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._search_index = None
+        self._write_count = 0
+        self._checkpointer = None
+        self._stop_checkpoints = threading.Event()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_name,
+                timeout=self.busy_timeout,
+                cached_statements=self.cached_statements,
+                check_same_thread=False
+            )
+            # NORMAL is durable in WAL mode except for the last commits on power loss
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(f'PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}')
+            if self._checkpointer is not None:
+                conn.execute('PRAGMA wal_autocheckpoint = 0')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _start_checkpointer(self):
+        if not self.checkpoint_interval or self._checkpointer is not None:
+            return
+        self._stop_checkpoints.clear()
+        self._checkpointer = threading.Thread(target=self._checkpoint_loop, name='gym-checkpoint', daemon=True)
+        self._checkpointer.start()
+        with self._lock:
+            for conn in self._connections:
+                conn.execute('PRAGMA wal_autocheckpoint = 0')
+
+    def _checkpoint_loop(self):
+        # Autocheckpoint is off, so this thread must outlive any error or the
+        # write-ahead log grows without bound
+        conn = None
+        try:
+            while not self._stop_checkpoints.wait(self.checkpoint_interval):
+                try:
+                    if conn is None:
+                        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout, check_same_thread=False)
+                    conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+                except sqlite3.OperationalError:
+                    pass  # Busy; the next round catches up
+                except sqlite3.Error:
+                    logger.exception("WAL checkpoint of %s failed; reconnecting", self.db_name)
+                    conn.close()
+                    conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        if self._checkpointer is not None:
+            self._stop_checkpoints.set()
+            self._checkpointer.join()
+            self._checkpointer = None
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+        self._search_index = None
+
+    def add_user(self, name, phone, program_type, diet, training, coach, active=True):
+        registration = datetime.now()
+        expiration = registration + timedelta(days=30)
+        with self.transaction() as conn:
+            cursor = conn.execute(INSERT_USER_SQL, (name, phone, program_type, int(diet), int(training), int(coach), registration.isoformat(),
+                  expiration.isoformat(), int(active), to_epoch(registration), to_epoch(expiration), normalize_phone(phone)))
+        return cursor.lastrowid
+
+    def insert_users(self, rows):
+        """Insert many member value tuples (INSERT_USER_SQL without phone_normalized) in a single transaction."""
+        with self.transaction() as conn:
+            conn.executemany(INSERT_USER_SQL, (tuple(row) + (normalize_phone(row[1]),) for row in rows))
+
+    def iter_users(self, chunk_size=5000):
+        """Yield all users in id order, chunk_size rows at a time, from one cursor."""
+        cursor = self.connection().execute('SELECT * FROM users ORDER BY id')
+        try:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            cursor.close()
+
+    def update_user(self, user_id, name, phone, program_type, diet, training, coach, active):
+        # phone_normalized is only rewritten when the phone changes, so a member
+        # whose duplicate number the migration left unnormalized stays editable
+        with self.transaction() as conn:
+            result = conn.execute('SELECT active FROM users WHERE id=?', (user_id,)).fetchone()
+            current_active = result[0] if result else 0
+
+            if active and not current_active:
+                new_expiration = datetime.now() + timedelta(days=30)
+                conn.execute('''
+                    UPDATE users SET name=?, phone=?, program_type=?, diet=?, training=?, coach=?, active=?,
+                        phone_normalized=CASE WHEN phone = ? THEN phone_normalized ELSE ? END,
+                        expiration_date=?, expiration_ts=?
+                    WHERE id=?
+                ''', (name, phone, program_type, int(diet), int(training), int(coach), int(active),
+                      phone, normalize_phone(phone), new_expiration.isoformat(), to_epoch(new_expiration), user_id))
+            else:
+                conn.execute('''
+                    UPDATE users SET name=?, phone=?, program_type=?, diet=?, training=?, coach=?, active=?,
+                        phone_normalized=CASE WHEN phone = ? THEN phone_normalized ELSE ? END
+                    WHERE id=?
+                ''', (name, phone, program_type, int(diet), int(training), int(coach), int(active),
+                      phone, normalize_phone(phone), user_id))
+
+    def update_user_fields(self, user_id, fields):
+        """Write only the given columns; reactivating still grants a fresh 30 days."""
+        unknown = set(fields) - set(EDITABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"not editable: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        values = {
+            field: int(value) if field in FLAG_FIELDS else value
+            for field, value in fields.items()
+        }
+        if 'phone' in values:
+            values['phone_normalized'] = normalize_phone(values['phone'])
+        with self.transaction() as conn:
+            if values.get('active'):
+                result = conn.execute('SELECT active FROM users WHERE id=?', (user_id,)).fetchone()
+                if result and not result[0]:
+                    new_expiration = datetime.now() + timedelta(days=30)
+                    values['expiration_date'] = new_expiration.isoformat()
+                    values['expiration_ts'] = to_epoch(new_expiration)
+            assignments = ', '.join(f"{column}=?" for column in values)
+            conn.execute(f'UPDATE users SET {assignments} WHERE id=?', (*values.values(), user_id))
+
+    def delete_user(self, user_id):
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM users WHERE id=?', (user_id,))
+
+    def get_all_users(self):
+        return self.connection().execute('SELECT * FROM users').fetchall()
+
+    def get_user_stats(self):
+        return self.connection().execute('SELECT total, active, inactive FROM user_counters WHERE id=1').fetchone()
+
+    def init_schema(self):
+        conn = self.connection()
+        conn.execute('PRAGMA journal_mode = WAL')
+        migrate(conn)
+        self.prune_changes()
+        self.reset_schema_cache()
+        self._start_checkpointer()
+
+    def reset_schema_cache(self):
+        self._search_index = None
+
+    def has_search_index(self):
+        if self._search_index is None:
+            row = self.connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='users_fts'"
+            ).fetchone()
+            self._search_index = row is not None
+        return self._search_index
+
+    def _use_search_index(self, query):
+        # Trigrams need at least three characters, and LIKE wildcards in the
+        # query have no FTS equivalent, so those cases keep the plain scan.
+        return len(query) >= 3 and '%' not in query and '_' not in query and self.has_search_index()
+
+    def search_users(self, query):
+        if self._use_search_index(query):
+            return self.connection().execute('''
+                SELECT * FROM users WHERE id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)
+            ''', (fts_phrase(query),)).fetchall()
+        return self.connection().execute('''
+            SELECT * FROM users WHERE name LIKE ? OR phone LIKE ?
+        ''', (f'%{query}%', f'%{query}%')).fetchall()
+
+    def fetch_users_page(self, query='', after_id=0, limit=PAGE_SIZE):
+        conn = self.connection()
+        if query and self._use_search_index(query):
+            return conn.execute('''
+                SELECT users.* FROM (
+                    SELECT rowid FROM users_fts WHERE users_fts MATCH ? AND rowid > ? ORDER BY rowid LIMIT ?
+                ) AS hits JOIN users ON users.id = hits.rowid ORDER BY users.id
+            ''', (fts_phrase(query), after_id, limit)).fetchall()
+        if query:
+            return conn.execute('''
+                SELECT * FROM users WHERE id > ? AND (name LIKE ? OR phone LIKE ?) ORDER BY id LIMIT ?
+            ''', (after_id, f'%{query}%', f'%{query}%', limit)).fetchall()
+        return conn.execute('SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit)).fetchall()
+
+    def fetch_users_by_expiration(self, query='', after=None, limit=PAGE_SIZE):
+        """Users ordered by (expiration_ts, id), strictly after the given key pair."""
+        after_ts, after_id = after if after else (-2 ** 63, 0)
+        conn = self.connection()
+        if query and self._use_search_index(query):
+            return conn.execute('''
+                SELECT * FROM users WHERE (expiration_ts, id) > (?, ?)
+                    AND id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?)
+                ORDER BY expiration_ts, id LIMIT ?
+            ''', (after_ts, after_id, fts_phrase(query), limit)).fetchall()
+        if query:
+            return conn.execute('''
+                SELECT * FROM users WHERE (expiration_ts, id) > (?, ?) AND (name LIKE ? OR phone LIKE ?)
+                ORDER BY expiration_ts, id LIMIT ?
+            ''', (after_ts, after_id, f'%{query}%', f'%{query}%', limit)).fetchall()
+        return conn.execute('''
+            SELECT * FROM users WHERE (expiration_ts, id) > (?, ?) ORDER BY expiration_ts, id LIMIT ?
+        ''', (after_ts, after_id, limit)).fetchall()
+
+    def list_users(self, query='', order='id', cursor=None, limit=PAGE_SIZE):
+        """One page of users plus the cursor token for the next page (None at the end).
+
+        Pages are found with keyset conditions on the sort key rather than
+        OFFSET, so every page costs the same however deep into the list it is.
+        """
+        key = decode_cursor(cursor, order) if cursor else None
+        if order == 'id':
+            users = self.fetch_users_page(query, key[0] if key else 0, limit)
+        elif order == 'expiration':
+            users = self.fetch_users_by_expiration(query, key, limit)
+        else:
+            raise ValueError(f"unknown order: {order}")
+        next_cursor = encode_cursor(order, users[-1]) if len(users) == limit else None
+        return users, next_cursor
+
+    def get_user_by_id(self, user_id):
+        return self.connection().execute('SELECT * FROM users WHERE id=?', (user_id,)).fetchone()
+
+    def find_user_by_phone(self, phone):
+        """The member registered under phone, in any digits or prefix form, or None."""
+        normalized = normalize_phone(phone)
+        if normalized is None:
+            return None
+        return self.connection().execute(
+            'SELECT * FROM users WHERE phone_normalized=?', (normalized,)
+        ).fetchone()
+
+    def registered_phones(self, normalized_phones):
+        """The subset of the given normalized phones that already belong to a member."""
+        phones = list(normalized_phones)
+        found = set()
+        for start in range(0, len(phones), 500):
+            chunk = phones[start:start + 500]
+            found.update(row[0] for row in self.connection().execute(
+                f"SELECT phone_normalized FROM users WHERE phone_normalized IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return found
+
+    def get_users_by_ids(self, user_ids, query=''):
+        """The given members that still exist and match query, in id order."""
+        ids = sorted(set(user_ids))
+        conn = self.connection()
+        users = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            if query and self._use_search_index(query):
+                users += conn.execute(f'''
+                    SELECT * FROM users WHERE id IN ({placeholders})
+                        AND id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ?) ORDER BY id
+                ''', (*chunk, fts_phrase(query))).fetchall()
+            elif query:
+                users += conn.execute(f'''
+                    SELECT * FROM users WHERE id IN ({placeholders}) AND (name LIKE ? OR phone LIKE ?) ORDER BY id
+                ''', (*chunk, f'%{query}%', f'%{query}%')).fetchall()
+            else:
+                users += conn.execute(
+                    f'SELECT * FROM users WHERE id IN ({placeholders}) ORDER BY id', chunk
+                ).fetchall()
+        return users
+
+    def latest_change(self):
+        """Sequence number of the newest entry in the users change feed, 0 if none."""
+        return self.connection().execute('SELECT COALESCE(MAX(seq), 0) FROM user_changes').fetchone()[0]
+
+    def get_changes_since(self, seq, limit=CHANGE_BATCH_SIZE):
+        """Up to limit (seq, user_id, op) entries newer than seq, oldest first.
+
+        Returns None when the feed can no longer say what changed after seq,
+        because those entries were pruned or seq comes from another database;
+        the caller must then reload everything.
+        """
+        # One statement, so the bounds and the entries come from the same snapshot
+        rows = self.connection().execute('''
+            WITH bounds AS (
+                SELECT (SELECT MIN(seq) FROM user_changes) AS oldest,
+                       (SELECT COALESCE(MAX(seq), 0) FROM user_changes) AS latest
+            )
+            SELECT bounds.oldest, bounds.latest, entries.seq, entries.user_id, entries.op FROM bounds
+            LEFT JOIN (
+                SELECT seq, user_id, op FROM user_changes WHERE seq > ? ORDER BY seq LIMIT ?
+            ) AS entries
+            ORDER BY entries.seq
+        ''', (seq, limit)).fetchall()
+        oldest, latest = rows[0][:2]
+        if seq > latest or (oldest is not None and seq < oldest - 1):
+            return None
+        entries = [row[2:] for row in rows if row[2] is not None]
+        if any(op == CHANGE_RESET for _, _, op in entries):
+            return None
+        return entries
+
+    def prune_changes(self, keep=CHANGE_LOG_KEEP):
+        """Drop all but the newest keep entries of the change feed; returns how many went."""
+        with self.transaction() as conn:
+            return conn.execute(
+                'DELETE FROM user_changes WHERE seq <= (SELECT MAX(seq) FROM user_changes) - ?', (keep,)
+            ).rowcount
+
+    def daily_activity(self, first_day, last_day):
+        """Per-day (day, program_type, signups, renewals, expiring, diet, training, coach) rows, from the rollups."""
+        return self.connection().execute('''
+            SELECT day, program_type, SUM(signups), SUM(renewals), SUM(expiring), SUM(diet), SUM(training), SUM(coach)
+            FROM (
+                SELECT day, program_type, signups, 0 AS renewals, 0 AS expiring, diet, training, coach
+                    FROM analytics_signups WHERE day BETWEEN :first AND :last
+                UNION ALL
+                SELECT day, program_type, 0, renewals, 0, 0, 0, 0
+                    FROM analytics_renewals WHERE day BETWEEN :first AND :last
+                UNION ALL
+                SELECT day, program_type, 0, 0, members, 0, 0, 0
+                    FROM analytics_expirations WHERE day BETWEEN :first AND :last
+            )
+            GROUP BY day, program_type ORDER BY day, program_type
+        ''', {'first': first_day, 'last': last_day}).fetchall()
+
+    def rebuild_analytics(self):
+        """Recompute the signup and expiration rollups from users; renewal history is kept.
+
+        The triggers already keep both equal to a rebuild, so this only
+        backfills or repairs them; it does not change a correct report.
+        """
+        with self.transaction() as conn:
+            rebuild_analytics_tables(conn)
+
+    def renormalize_phones(self):
+        """Recompute every normalized phone; returns ids of members left without one as duplicates."""
+        with self.transaction() as conn:
+            return normalize_phone_column(conn)
+
+    def expire_lapsed_users(self, now=None):
+        """Clear the active flag of every member whose subscription has run out.
+
+        A single UPDATE driven by idx_users_active_expiration; returns the number
+        of members it deactivated.
+        """
+        now_ts = to_epoch(now or datetime.now())
+        with self.transaction() as conn:
+            return conn.execute('''
+                UPDATE users INDEXED BY idx_users_active_expiration SET active=0
+                WHERE active=1 AND expiration_ts <= ?
+            ''', (now_ts,)).rowcount
+
+    def next_expiration(self, now_ts):
+        """When the next sweep is due: the earliest expiration_ts after now_ts.
+
+        An active member whose subscription already ended makes the sweep due
+        at once, so their expiration_ts is returned even if it is in the past.
+        Both halves are single index lookups. None if nothing is left to expire.
+        """
+        return self.connection().execute('''
+            SELECT MIN(COALESCE(lapsed, upcoming), COALESCE(upcoming, lapsed)) FROM (
+                SELECT (SELECT MIN(expiration_ts) FROM users INDEXED BY idx_users_active_expiration
+                        WHERE active = 1) AS lapsed,
+                       (SELECT MIN(expiration_ts) FROM users WHERE expiration_ts > ?) AS upcoming
+            )
+        ''', (now_ts,)).fetchone()[0]
+
+    @contextmanager
+    def transaction(self):
+        """Commit on success, roll back on error, and count the write for data_version().
+
+        A transaction opened while another one is running on the same thread
+        joins the outer one, so several writes can be committed together.
+        """
+        conn = self.connection()
+        if getattr(self._local, 'in_transaction', False):
+            yield conn
+            return
+        changes = conn.total_changes
+        self._local.in_transaction = True
+        try:
+            self._begin_immediate(conn)
+            with conn:
+                yield conn
+        finally:
+            self._local.in_transaction = False
+        if conn.total_changes != changes:
+            with self._lock:
+                self._write_count += 1
+
+    def _begin_immediate(self, conn):
+        """Take the write lock, retrying with backoff once the busy timeout has run out.
+
+        Taking it up front means a transaction that reads before it writes
+        cannot fail halfway with SQLITE_BUSY when it upgrades its lock.
+        """
+        delay = BUSY_BACKOFF
+        for attempt in range(self.busy_retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as exc:
+                if 'locked' not in str(exc) or attempt == self.busy_retries:
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+
+    def data_version(self):
+        """Token that changes whenever any connection commits to the database.
+
+        PRAGMA data_version ignores commits made through the same connection, so
+        writes made through this repository are folded in with a local counter.
+        """
+        version = self.connection().execute('PRAGMA data_version').fetchone()[0]
+        return version, self._write_count
+
+    @contextmanager
+    def interruptible(self, should_cancel, every=1000):
+        """Abort statements on this thread's connection once should_cancel() is true."""
+        conn = self.connection()
+        conn.set_progress_handler(should_cancel, every)
+        try:
+            yield conn
+        finally:
+            conn.set_progress_handler(None, every)
+
+    def renew_subscription(self, user_id):
+        new_expiration = datetime.now() + timedelta(days=30)
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE users SET expiration_date=?, expiration_ts=?, active=1 WHERE id=?',
+                (new_expiration.isoformat(), to_epoch(new_expiration), user_id)
+            )
+
+    def member_status(self, user_id, now_ts):
+        """CHECKIN_OK, CHECKIN_EXPIRED or CHECKIN_UNKNOWN for a member checking in at now_ts."""
+        row = self.connection().execute(
+            'SELECT active, expiration_ts FROM users WHERE id=?', (user_id,)
+        ).fetchone()
+        if row is None:
+            return CHECKIN_UNKNOWN
+        active, expiration_ts = row
+        return CHECKIN_OK if active and expiration_ts > now_ts else CHECKIN_EXPIRED
+
+    def record_attendance(self, events):
+        """Append (user_id, checkin_ts, day, hour, source) check-ins in one transaction."""
+        with self.transaction() as conn:
+            conn.executemany(INSERT_ATTENDANCE_SQL, events)
+
+    def member_visits(self, user_id, first_day, last_day):
+        """Visits of one member between two day ordinals, inclusive, from the daily rollup."""
+        return self.connection().execute('''
+            SELECT COALESCE(SUM(visits), 0) FROM attendance_daily WHERE user_id = ? AND day BETWEEN ? AND ?
+        ''', (user_id, first_day, last_day)).fetchone()[0]
+
+    def daily_visits(self, first_day, last_day):
+        """(day ordinal, visits) for every day with check-ins in the range."""
+        return self.connection().execute('''
+            SELECT day, SUM(visits) FROM attendance_hourly WHERE day BETWEEN ? AND ? GROUP BY day ORDER BY day
+        ''', (first_day, last_day)).fetchall()
+
+    def hourly_visits(self, first_day, last_day):
+        """Visits per hour of the day (24 counts) over a range of days, for peak-hour charts."""
+        counts = [0] * 24
+        for hour, visits in self.connection().execute('''
+            SELECT hour, SUM(visits) FROM attendance_hourly WHERE day BETWEEN ? AND ? GROUP BY hour
+        ''', (first_day, last_day)):
+            counts[hour] = visits
+        return counts
+
+# Phone numbers are matched exactly on a normalized copy: ASCII digits in the
+# domestic 0XXXXXXXXXX form, whatever digits and prefix they were typed with.
+PHONE_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+def normalize_phone(phone):
+    """Canonical form of a phone number for exact lookups, or None if it has no digits.
+
+    Persian and Arabic-Indic digits become ASCII and separators are dropped.
+    The +98, 0098 and 98 prefixes, and a mobile number missing its leading 0,
+    are folded into the domestic 0XXXXXXXXXX form. Other international
+    numbers keep a leading +.
+    """
+    if phone is None:
+        return None
+    text = str(phone).translate(PHONE_DIGITS).strip()
+    digits = ''.join(ch for ch in text if '0' <= ch <= '9')
+    if not digits:
+        return None
+    if text.startswith('+'):
+        return '0' + digits[2:] if digits.startswith('98') else '+' + digits
+    if digits.startswith('0098'):
+        return '0' + digits[4:]
+    if digits.startswith('98') and len(digits) == 12:
+        return '0' + digits[2:]
+    if digits.startswith('9') and len(digits) == 10:
+        return '0' + digits
+    return digits
+
+def normalize_phone_column(conn, chunk_size=5000):
+    """Recompute users.phone_normalized for every row and rebuild its unique index.
+
+    Must run inside a transaction. When several members share a number,
+    the oldest keeps it. The others get NULL, so exact lookups skip them,
+    and their ids are returned.
+    """
+    conn.execute('DROP INDEX IF EXISTS idx_users_phone_normalized')
+    after_id = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, phone, phone_normalized FROM users WHERE id > ? ORDER BY id LIMIT ?', (after_id, chunk_size)
+        ).fetchall()
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        changed = [
+            (normalized, user_id) for user_id, phone, current in rows
+            if (normalized := normalize_phone(phone)) != current
+        ]
+        conn.executemany('UPDATE users SET phone_normalized = ? WHERE id = ?', changed)
+    duplicates = [row[0] for row in conn.execute('''
+        SELECT id FROM users WHERE phone_normalized IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM users WHERE phone_normalized IS NOT NULL GROUP BY phone_normalized
+        ) ORDER BY id
+    ''').fetchall()]
+    conn.executemany('UPDATE users SET phone_normalized = NULL WHERE id = ?', [(user_id,) for user_id in duplicates])
+    conn.execute('''
+        CREATE UNIQUE INDEX idx_users_phone_normalized ON users(phone_normalized) WHERE phone_normalized IS NOT NULL
+    ''')
+    return duplicates
+
+# Trigram full-text index over name and phone, kept in sync by triggers so
+# substring searches no longer scan the whole users table.
+SEARCH_INDEX_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE users_fts USING fts5(
+        name, phone, content='users', content_rowid='id', tokenize='trigram'
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, name, phone) VALUES (new.id, new.name, new.phone);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, phone) VALUES ('delete', old.id, old.name, old.phone);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, phone ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, phone) VALUES ('delete', old.id, old.name, old.phone);
+        INSERT INTO users_fts(rowid, name, phone) VALUES (new.id, new.name, new.phone);
+    END
+    ''',
+]
+
+def fts_phrase(query):
+    """Quote query as a single FTS5 phrase restricted to the name and phone columns."""
+    escaped = query.replace('"', '""')
+    return f'{{name phone}} : "{escaped}"'
+
+def create_search_index(cursor):
+    """Create and backfill users_fts if missing; returns False when FTS5 trigram is unavailable."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='users_fts'")
+    if cursor.fetchone():
+        return True
+    try:
+        for statement in SEARCH_INDEX_SCHEMA:
+            cursor.execute(statement)
+    except sqlite3.OperationalError:
+        # SQLite built without FTS5 or older than 3.34: search keeps using LIKE.
+        return False
+    cursor.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    return True
+
+# Membership counters maintained by triggers, so the header stats are a
+# single-row read instead of three COUNT(*) scans over users.
+COUNTERS_SCHEMA = [
+    '''
+    CREATE TABLE user_counters (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL,
+        active INTEGER NOT NULL,
+        inactive INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_counters_insert AFTER INSERT ON users BEGIN
+        UPDATE user_counters SET total = total + 1,
+            active = active + (new.active = 1), inactive = inactive + (new.active = 0)
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_counters_delete AFTER DELETE ON users BEGIN
+        UPDATE user_counters SET total = total - 1,
+            active = active - (old.active = 1), inactive = inactive - (old.active = 0)
+        WHERE id = 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_counters_update AFTER UPDATE OF active ON users BEGIN
+        UPDATE user_counters SET
+            active = active + (new.active = 1) - (old.active = 1),
+            inactive = inactive + (new.active = 0) - (old.active = 0)
+        WHERE id = 1;
+    END
+    ''',
+]
+
+def create_counters(cursor):
+    """Create user_counters and its triggers if missing, seeding it from users."""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='user_counters'")
+    if cursor.fetchone():
+        return
+    for statement in COUNTERS_SCHEMA:
+        cursor.execute(statement)
+    cursor.execute('''
+        INSERT INTO user_counters (id, total, active, inactive)
+        SELECT 1, COUNT(*), COALESCE(SUM(active = 1), 0), COALESCE(SUM(active = 0), 0) FROM users
+    ''')
+
+# Append-only check-in log. Each check-in carries its local day ordinal and
+# hour, and triggers roll it up into per-member daily and gym-wide hourly
+# counts, so visit totals and peak-hour charts never scan the raw log.
+ATTENDANCE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        checkin_ts INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        source TEXT NOT NULL DEFAULT 'desk'
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_attendance_user_day ON attendance(user_id, day)',
+    'CREATE INDEX IF NOT EXISTS idx_attendance_day_hour ON attendance(day, hour)',
+    '''
+    CREATE TABLE IF NOT EXISTS attendance_daily (
+        user_id INTEGER NOT NULL,
+        day INTEGER NOT NULL,
+        visits INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS attendance_hourly (
+        day INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        visits INTEGER NOT NULL,
+        PRIMARY KEY (day, hour)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS attendance_rollup AFTER INSERT ON attendance BEGIN
+        INSERT INTO attendance_daily (user_id, day, visits) VALUES (new.user_id, new.day, 1)
+            ON CONFLICT (user_id, day) DO UPDATE SET visits = visits + 1;
+        INSERT INTO attendance_hourly (day, hour, visits) VALUES (new.day, new.hour, 1)
+            ON CONFLICT (day, hour) DO UPDATE SET visits = visits + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS attendance_no_update BEFORE UPDATE ON attendance BEGIN
+        SELECT RAISE(ABORT, 'attendance is append-only');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS attendance_no_delete BEFORE DELETE ON attendance BEGIN
+        SELECT RAISE(ABORT, 'attendance is append-only');
+    END
+    ''',
+]
+
+INSERT_ATTENDANCE_SQL = '''
+    INSERT INTO attendance (user_id, checkin_ts, day, hour, source) VALUES (?, ?, ?, ?, ?)
+'''
+
+def migrate_attendance(cursor):
+    for statement in ATTENDANCE_SCHEMA:
+        cursor.execute(statement)
+
+# Change feed: triggers append one entry per insert, update or delete on users.
+# AUTOINCREMENT keeps seq increasing even after old entries are pruned, so every
+# process sharing the database can ask what changed since the last seq it saw.
+CHANGES_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS user_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        op TEXT NOT NULL
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_changes_insert AFTER INSERT ON users BEGIN
+        INSERT INTO user_changes (user_id, op) VALUES (new.id, 'insert');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_changes_update AFTER UPDATE ON users BEGIN
+        INSERT INTO user_changes (user_id, op) VALUES (new.id, 'update');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS user_changes_delete AFTER DELETE ON users BEGIN
+        INSERT INTO user_changes (user_id, op) VALUES (old.id, 'delete');
+    END
+    ''',
+]
+
+def migrate_change_feed(cursor):
+    for statement in CHANGES_SCHEMA:
+        cursor.execute(statement)
+
+def reset_change_feed(conn, floor):
+    """Replace the feed with a single CHANGE_RESET entry numbered above floor.
+
+    Used when the users table is swapped wholesale: every reader that saw a
+    sequence number up to floor is told to reload instead of seeing the
+    numbers go backwards.
+    """
+    floor = max(floor, conn.execute('SELECT COALESCE(MAX(seq), 0) FROM user_changes').fetchone()[0])
+    conn.execute('DELETE FROM user_changes')
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'user_changes'")
+    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('user_changes', ?)", (floor,))
+    conn.execute('INSERT INTO user_changes (user_id, op) VALUES (0, ?)', (CHANGE_RESET,))
+
+# Reporting rollups kept by triggers, keyed by local day ordinal (the same
+# numbering as date.toordinal()) and program type:
+# - analytics_signups: current members registered that day, with their
+#   current program and add-ons; edits move a member, deletes remove them
+# - analytics_renewals: subscriptions renewed or reactivated that day (any
+#   write that sets expiration_ts, even to the value it already had)
+# - analytics_expirations: members whose current subscription ends that day;
+#   a renewal moves the member to their new end day
+# The triggers keep signups and expirations equal to what rebuild_analytics()
+# recomputes from users; renewals are not kept in users, so a rebuild leaves
+# them alone.
+ANALYTICS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_signups (
+        day INTEGER NOT NULL,
+        program_type TEXT NOT NULL,
+        signups INTEGER NOT NULL,
+        diet INTEGER NOT NULL,
+        training INTEGER NOT NULL,
+        coach INTEGER NOT NULL,
+        PRIMARY KEY (day, program_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_renewals (
+        day INTEGER NOT NULL,
+        program_type TEXT NOT NULL,
+        renewals INTEGER NOT NULL,
+        PRIMARY KEY (day, program_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_expirations (
+        day INTEGER NOT NULL,
+        program_type TEXT NOT NULL,
+        members INTEGER NOT NULL,
+        PRIMARY KEY (day, program_type)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS analytics_insert AFTER INSERT ON users BEGIN
+        INSERT INTO analytics_signups (day, program_type, signups, diet, training, coach)
+            VALUES (CAST(julianday(new.registration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER),
+                    new.program_type, 1, new.diet != 0, new.training != 0, new.coach != 0)
+            ON CONFLICT (day, program_type) DO UPDATE SET signups = signups + 1,
+                diet = diet + excluded.diet, training = training + excluded.training, coach = coach + excluded.coach;
+        INSERT INTO analytics_expirations (day, program_type, members)
+            VALUES (CAST(julianday(new.expiration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER),
+                    new.program_type, 1)
+            ON CONFLICT (day, program_type) DO UPDATE SET members = members + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS analytics_renewal AFTER UPDATE OF expiration_ts ON users BEGIN
+        INSERT INTO analytics_renewals (day, program_type, renewals)
+            VALUES (CAST(julianday('now', 'localtime', 'start of day') - 1721424.5 AS INTEGER), new.program_type, 1)
+            ON CONFLICT (day, program_type) DO UPDATE SET renewals = renewals + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS analytics_move_expiration AFTER UPDATE OF expiration_ts, program_type ON users
+    WHEN new.expiration_ts != old.expiration_ts OR new.program_type != old.program_type BEGIN
+        UPDATE analytics_expirations SET members = members - 1
+            WHERE day = CAST(julianday(old.expiration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER)
+                AND program_type = old.program_type;
+        INSERT INTO analytics_expirations (day, program_type, members)
+            VALUES (CAST(julianday(new.expiration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER),
+                    new.program_type, 1)
+            ON CONFLICT (day, program_type) DO UPDATE SET members = members + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS analytics_move_signup
+    AFTER UPDATE OF registration_ts, program_type, diet, training, coach ON users
+    WHEN new.registration_ts != old.registration_ts OR new.program_type != old.program_type
+        OR (new.diet != 0) != (old.diet != 0) OR (new.training != 0) != (old.training != 0)
+        OR (new.coach != 0) != (old.coach != 0) BEGIN
+        UPDATE analytics_signups SET signups = signups - 1,
+            diet = diet - (old.diet != 0), training = training - (old.training != 0), coach = coach - (old.coach != 0)
+            WHERE day = CAST(julianday(old.registration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER)
+                AND program_type = old.program_type;
+        INSERT INTO analytics_signups (day, program_type, signups, diet, training, coach)
+            VALUES (CAST(julianday(new.registration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER),
+                    new.program_type, 1, new.diet != 0, new.training != 0, new.coach != 0)
+            ON CONFLICT (day, program_type) DO UPDATE SET signups = signups + 1,
+                diet = diet + excluded.diet, training = training + excluded.training, coach = coach + excluded.coach;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS analytics_delete AFTER DELETE ON users BEGIN
+        UPDATE analytics_signups SET signups = signups - 1,
+            diet = diet - (old.diet != 0), training = training - (old.training != 0), coach = coach - (old.coach != 0)
+            WHERE day = CAST(julianday(old.registration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER)
+                AND program_type = old.program_type;
+        UPDATE analytics_expirations SET members = members - 1
+            WHERE day = CAST(julianday(old.expiration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER)
+                AND program_type = old.program_type;
+    END
+    ''',
+]
+
+def rebuild_analytics_tables(conn):
+    """Recompute the signup and expiration rollups from users."""
+    conn.execute('DELETE FROM analytics_signups')
+    conn.execute('''
+        INSERT INTO analytics_signups (day, program_type, signups, diet, training, coach)
+        SELECT CAST(julianday(registration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER) AS day,
+               program_type, COUNT(*), SUM(diet != 0), SUM(training != 0), SUM(coach != 0)
+        FROM users GROUP BY day, program_type
+    ''')
+    conn.execute('DELETE FROM analytics_expirations')
+    conn.execute('''
+        INSERT INTO analytics_expirations (day, program_type, members)
+        SELECT CAST(julianday(expiration_ts, 'unixepoch', 'localtime', 'start of day') - 1721424.5 AS INTEGER) AS day,
+               program_type, COUNT(*)
+        FROM users GROUP BY day, program_type
+    ''')
+
+def migrate_analytics(cursor):
+    for statement in ANALYTICS_SCHEMA:
+        cursor.execute(statement)
+    rebuild_analytics_tables(cursor)
+
+def migrate_signup_tracking(cursor):
+    # Version 9 only counted signups on insert; reinstall the delete trigger
+    # with the signup decrement, add the move trigger and recount.
+    cursor.execute('DROP TRIGGER IF EXISTS analytics_delete')
+    migrate_analytics(cursor)
+
+# Keyset pagination cursors: an opaque token holding the sort order and the
+# sort key of the last row that was returned.
+USER_ORDERS = ('id', 'expiration')
+
+def encode_cursor(order, user):
+    key = [user[0]] if order == 'id' else [user[11], user[0]]
+    payload = json.dumps([order] + key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(token, order):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        raise ValueError("invalid cursor") from None
+    expected_length = 2 if order == 'id' else 3
+    if (not isinstance(data, list) or len(data) != expected_length or data[0] != order
+            or not all(isinstance(value, int) for value in data[1:])):
+        raise ValueError("invalid cursor")
+    return data[1:]
+
+_repository = None
+
+def get_repository():
+    global _repository
+    if _repository is None:
+        _repository = UserRepository(DB_NAME)
+    return _repository
+
+def set_repository(repository):
+    global _repository
+    if _repository is not None and _repository is not repository:
+        _repository.close()
+    _repository = repository
+
+def _table_columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+def migrate_base_schema(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            program_type TEXT NOT NULL,
+            diet BOOLEAN NOT NULL,
+            training BOOLEAN NOT NULL,
+            coach BOOLEAN NOT NULL,
+            registration_date TEXT NOT NULL,
+            expiration_date TEXT NOT NULL,
+            active BOOLEAN NOT NULL DEFAULT 1
+        )
+    ''')
+    if 'active' not in _table_columns(cursor, 'users'):
+        cursor.execute('ALTER TABLE users ADD COLUMN active BOOLEAN NOT NULL DEFAULT 1')
+
+def migrate_timestamps_and_indexes(cursor):
+    # Integer epoch copies of the ISO dates, so date range filters can use an
+    # index instead of parsing every row in Python.
+    columns = _table_columns(cursor, 'users')
+    if 'registration_ts' not in columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN registration_ts INTEGER')
+    if 'expiration_ts' not in columns:
+        cursor.execute('ALTER TABLE users ADD COLUMN expiration_ts INTEGER')
+    cursor.execute('''
+        UPDATE users SET
+            registration_ts = CAST(strftime('%s', registration_date, 'utc') AS INTEGER),
+            expiration_ts = CAST(strftime('%s', expiration_date, 'utc') AS INTEGER)
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_expiration_ts ON users(expiration_ts)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_active ON users(active)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_program_type ON users(program_type)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone)')
+
+def migrate_expiry_index(cursor):
+    # Only members still flagged active can lapse, so the sweeper's range scan
+    # touches exactly the rows it may update.
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_active_expiration ON users(expiration_ts) WHERE active = 1
+    ''')
+
+def migrate_phone_normalized(cursor):
+    if 'phone_normalized' not in _table_columns(cursor, 'users'):
+        cursor.execute('ALTER TABLE users ADD COLUMN phone_normalized TEXT')
+    normalize_phone_column(cursor)
+
+# Schema versions tracked in PRAGMA user_version. Append new steps; never edit
+# or reorder released ones. Steps must tolerate databases created before
+# versioning existed, which may already contain some of the objects.
+MIGRATIONS = [
+    (1, migrate_base_schema),
+    (2, create_search_index),
+    (3, create_counters),
+    (4, migrate_timestamps_and_indexes),
+    (5, migrate_expiry_index),
+    (6, migrate_attendance),
+    (7, migrate_phone_normalized),
+    (8, migrate_change_feed),
+    (9, migrate_analytics),
+    (10, migrate_signup_tracking),
+]
+
+def migrate(conn):
+    """Bring the database up to the latest schema version in a single transaction."""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    pending = [(target, step) for target, step in MIGRATIONS if target > version]
+    if not pending:
+        return version
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        for target, step in pending:
+            step(cursor)
+            version = target
+        cursor.execute(f'PRAGMA user_version = {version}')
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return version
+
+@timed('db.init_db')
+def init_db():
+    get_repository().init_schema()
+
+@timed('db.add_user')
+def add_user(name, phone, program_type, diet, training, coach, active=True):
+    return get_repository().add_user(name, phone, program_type, diet, training, coach, active)
+
+@timed('db.update_user')
+def update_user(user_id, name, phone, program_type, diet, training, coach, active):
+    get_repository().update_user(user_id, name, phone, program_type, diet, training, coach, active)
+
+@timed('db.update_user_fields')
+def update_user_fields(user_id, fields):
+    get_repository().update_user_fields(user_id, fields)
+
+@timed('db.delete_user')
+def delete_user(user_id):
+    get_repository().delete_user(user_id)
+
+@timed('db.get_all_users')
+def get_all_users():
+    return get_repository().get_all_users()
+
+@timed('db.get_user_stats')
+def get_user_stats():
+    return get_repository().get_user_stats()
+
+@timed('db.data_version')
+def data_version():
+    return get_repository().data_version()
+
+@timed('db.search_users')
+def search_users(query):
+    return get_repository().search_users(query)
+
+@timed('db.fetch_users_page')
+def fetch_users_page(query='', after_id=0, limit=PAGE_SIZE):
+    return get_repository().fetch_users_page(query, after_id, limit)
+
+@timed('db.list_users')
+def list_users(query='', order='id', cursor=None, limit=PAGE_SIZE):
+    return get_repository().list_users(query, order, cursor, limit)
+
+@timed('db.get_user_by_id')
+def get_user_by_id(user_id):
+    return get_repository().get_user_by_id(user_id)
+
+@timed('db.find_user_by_phone')
+def find_user_by_phone(phone):
+    return get_repository().find_user_by_phone(phone)
+
+@timed('db.get_users_by_ids')
+def get_users_by_ids(user_ids, query=''):
+    return get_repository().get_users_by_ids(user_ids, query)
+
+def latest_change():
+    return get_repository().latest_change()
+
+@timed('db.get_changes_since')
+def get_changes_since(seq, limit=CHANGE_BATCH_SIZE):
+    return get_repository().get_changes_since(seq, limit)
+
+@timed('db.renormalize_phones')
+def renormalize_phones():
+    return get_repository().renormalize_phones()
+
+@timed('db.renew_subscription')
+def renew_subscription(user_id):
+    get_repository().renew_subscription(user_id)
+
+@timed('db.expire_lapsed_users')
+def expire_lapsed_users(now=None):
+    return get_repository().expire_lapsed_users(now)
+
+@timed('db.next_expiration')
+def next_expiration(now_ts):
+    return get_repository().next_expiration(now_ts)
+
+# Bulk import
+IMPORT_BATCH_SIZE = 10000
+PROGRAM_TYPES = {'normal': 'normal', 'vip': 'vip', 'عادی': 'normal', 'ویژه': 'vip'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'بله'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'خیر', ''}
+
+def _parse_flag(value, field):
+    if isinstance(value, bool):
+        return int(value)
+    text = '' if value is None else str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return 1
+    if text in FALSE_VALUES:
+        return 0
+    raise ValueError(f"invalid {field}: {value!r}")
+
+def _parse_date(value, default, field):
+    if value is None or str(value).strip() == '':
+        return default
+    try:
+        dt = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"invalid {field}: {value!r}") from None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+def parse_import_record(record, now):
+    """Validate one imported member and return the values for INSERT_USER_SQL."""
+    name = str(record.get('name') or '').strip()
+    phone = str(record.get('phone') or '').strip()
+    if not name or not phone:
+        raise ValueError("name and phone are required")
+    program_type = PROGRAM_TYPES.get(str(record.get('program_type') or 'normal').strip().lower())
+    if program_type is None:
+        raise ValueError(f"invalid program_type: {record.get('program_type')!r}")
+    diet = _parse_flag(record.get('diet'), 'diet')
+    training = _parse_flag(record.get('training'), 'training')
+    coach = _parse_flag(record.get('coach'), 'coach')
+    active = record.get('active')
+    active = 1 if active is None or str(active).strip() == '' else _parse_flag(active, 'active')
+    registration = _parse_date(record.get('registration_date'), now, 'registration_date')
+    expiration = _parse_date(record.get('expiration_date'), registration + timedelta(days=30), 'expiration_date')
+    return (name, phone, program_type, diet, training, coach, registration.isoformat(), expiration.isoformat(),
+            active, to_epoch(registration), to_epoch(expiration))
+
+def iter_import_records(path, fmt=None):
+    """Yield (line_number, record) pairs from a CSV or JSONL file without reading it whole.
+
+    Malformed JSONL lines are yielded with record None so the caller can reject them.
+    """
+    if fmt is None:
+        fmt = 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+        elif fmt == 'jsonl':
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+        else:
+            raise ValueError(f"unknown import format: {fmt}")
+
+@timed('db.import_users')
+def import_users(path, fmt=None, batch_size=IMPORT_BATCH_SIZE, progress=None, on_reject=None):
+    """Stream members from a CSV or JSONL file into the users table.
+
+    Valid rows are inserted with executemany, one transaction per batch, so
+    memory stays flat regardless of file size. Rows whose phone already
+    belongs to a member, or to an earlier row of the file, are rejected.
+    progress(inserted, rejected) is called after every batch and
+    on_reject(line_number, record, reason) for every invalid row. Returns
+    (inserted, rejected).
+    """
+    repository = get_repository()
+    now = datetime.now()
+    inserted = rejected = 0
+    batch = []
+
+    def reject(line_number, record, reason):
+        nonlocal rejected
+        rejected += 1
+        if on_reject:
+            on_reject(line_number, record, reason)
+
+    def flush():
+        nonlocal inserted
+        phones = [normalize_phone(values[1]) for _, _, values in batch]
+        taken = repository.registered_phones({phone for phone in phones if phone is not None})
+        rows = []
+        for (line_number, record, values), phone in zip(batch, phones):
+            if phone is not None and phone in taken:
+                reject(line_number, record, "duplicate phone")
+                continue
+            if phone is not None:
+                taken.add(phone)
+            rows.append(values)
+        if rows:
+            repository.insert_users(rows)
+        inserted += len(rows)
+        batch.clear()
+
+    for line_number, record in iter_import_records(path, fmt):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("malformed record")
+            batch.append((line_number, record, parse_import_record(record, now)))
+        except ValueError as exc:
+            reject(line_number, record, str(exc))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+            if progress:
+                progress(inserted, rejected)
+    if batch:
+        flush()
+    if progress:
+        progress(inserted, rejected)
+    return inserted, rejected
+
+# Streaming export
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_FIELDS = [
+    'id', 'name', 'phone', 'program_type', 'diet', 'training', 'coach', 'active',
+    'registration_date', 'expiration_date', 'registration_jalali', 'expiration_jalali', 'subscription_status',
+]
+
+def export_records(chunk):
+    """Turn a chunk of users rows into export dicts with Jalali dates and subscription status."""
+    registration_jalali = to_jalali_batch([user[7] for user in chunk])
+    expiration_jalali = to_jalali_batch([user[8] for user in chunk])
+    for user, reg_jalali, exp_jalali in zip(chunk, registration_jalali, expiration_jalali):
+        yield {
+            'id': user[0], 'name': user[1], 'phone': user[2], 'program_type': user[3],
+            'diet': int(user[4]), 'training': int(user[5]), 'coach': int(user[6]), 'active': int(user[9]),
+            'registration_date': user[7], 'expiration_date': user[8],
+            'registration_jalali': reg_jalali, 'expiration_jalali': exp_jalali,
+            'subscription_status': 'active' if is_subscription_active(user[8]) else 'expired',
+        }
+
+@timed('db.export_users')
+def export_users(path, fmt=None, chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """Write every member to a CSV or JSONL file, chunk by chunk.
+
+    Rows come from a single cursor with fetchmany, so memory stays constant
+    however many members there are. progress(written) is called after each
+    chunk. Returns the number of rows written.
+    """
+    if fmt is None:
+        fmt = 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"unknown export format: {fmt}")
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = None
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+        for chunk in get_repository().iter_users(chunk_size):
+            records = export_records(chunk)
+            if writer:
+                writer.writerows(records)
+            else:
+                f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+            written += len(chunk)
+            if progress:
+                progress(written)
+    return written
+
+# Attendance
+ATTENDANCE_FLUSH_EVENTS = 500
+ATTENDANCE_FLUSH_SECONDS = 1.0
+# Longest wait between attempts while the database or server keeps failing
+ATTENDANCE_RETRY_MAX = 60.0
+CHECKIN_OK = 'ok'
+CHECKIN_EXPIRED = 'expired'
+CHECKIN_UNKNOWN = 'unknown'
+
+def attendance_event(user_id, when, source='desk'):
+    """INSERT_ATTENDANCE_SQL value tuple for a check-in at the naive local datetime when."""
+    return (user_id, to_epoch(when), when.toordinal(), when.hour, source)
+
+class AttendanceBuffer:
+    """Checks members in against the users table and appends check-ins in batches.
+
+    check_in() only does a primary-key lookup and appends to a list. A
+    background thread writes the waiting check-ins in one transaction every
+    max_delay seconds, or as soon as max_events are waiting. Call close()
+    before exiting to write what is left.
+    """
+
+    def __init__(self, repository=None, max_events=ATTENDANCE_FLUSH_EVENTS, max_delay=ATTENDANCE_FLUSH_SECONDS):
+        self.repository = repository
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self._events = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = None
+
+    def _repository(self):
+        return self.repository or get_repository()
+
+    def check_in(self, user_id, when=None, source='desk'):
+        """Record a visit if the member may enter; returns one of the CHECKIN_* statuses."""
+        when = when or datetime.now()
+        status = self._repository().member_status(user_id, to_epoch(when))
+        if status != CHECKIN_OK:
+            return status
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("attendance buffer is closed")
+            self._events.append(attendance_event(user_id, when, source))
+            pending = len(self._events)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='gym-attendance', daemon=True)
+                self._thread.start()
+        if pending >= self.max_events:
+            self._wakeup.set()
+        return status
+
+    def check_in_phone(self, phone, when=None, source='scanner'):
+        """check_in() for the member registered under a scanned or typed phone number."""
+        user = self._repository().find_user_by_phone(phone)
+        if user is None:
+            return CHECKIN_UNKNOWN
+        return self.check_in(user[0], when, source)
+
+    def pending(self):
+        with self._lock:
+            return len(self._events)
+
+    def flush(self):
+        """Write every waiting check-in now; returns how many were written."""
+        with self._lock:
+            events, self._events = self._events, []
+        if not events:
+            return 0
+        try:
+            self._repository().record_attendance(events)
+        except BaseException:
+            with self._lock:
+                self._events[:0] = events
+            raise
+        return len(events)
+
+    def _run(self):
+        backoff, retry_at = self.max_delay, 0
+        while not self._closed:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            if time.monotonic() < retry_at:
+                continue
+            try:
+                self.flush()
+                backoff, retry_at = self.max_delay, 0
+            except Exception:
+                # flush() put the batch back; wait longer after each failure so
+                # a locked database or an unreachable server is not hammered
+                backoff = min(backoff * 2, max(ATTENDANCE_RETRY_MAX, self.max_delay))
+                retry_at = time.monotonic() + backoff
+                logger.exception("writing %d check-ins failed; retrying in %.1f s", self.pending(), backoff)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+@timed('db.record_attendance')
+def record_attendance(events):
+    get_repository().record_attendance(events)
+
+@timed('db.member_visits')
+def member_visits(user_id, first_day, last_day):
+    return get_repository().member_visits(user_id, first_day, last_day)
+
+def visits_this_month(user_id, today=None):
+    """Visits of a member in the current Jalali month."""
+    first_day, last_day = jalali_month_days((today or datetime.now()).toordinal())
+    return member_visits(user_id, first_day, last_day)
+
+@timed('db.daily_visits')
+def daily_visits(first_day, last_day):
+    return get_repository().daily_visits(first_day, last_day)
+
+@timed('db.hourly_visits')
+def hourly_visits(first_day, last_day):
+    return get_repository().hourly_visits(first_day, last_day)
+
+# Monthly reports
+REPORT_FIELDS = (
+    'signups_normal', 'signups_vip', 'renewals_normal', 'renewals_vip', 'churned', 'due', 'diet', 'training', 'coach'
+)
+
+@timed('db.daily_activity')
+def daily_activity(first_day, last_day):
+    return get_repository().daily_activity(first_day, last_day)
+
+@timed('db.rebuild_analytics')
+def rebuild_analytics():
+    get_repository().rebuild_analytics()
+
+@timed('report.monthly_report')
+def monthly_report(year, today=None):
+    """Figures for each month of a Jalali year, summed from the daily rollups.
+
+    churned counts members whose subscription ended in the month, before today,
+    and who have not renewed since; due counts those ending from today on.
+    retention is the renewals' share of renewals plus churned, or None.
+    """
+    today = (today or datetime.now()).toordinal()
+    months = jalali_year_months(year)
+    starts = [first for _, first, _ in months]
+    report = [
+        dict(month=month, first_day=first, last_day=last, **dict.fromkeys(REPORT_FIELDS, 0))
+        for month, first, last in months
+    ]
+    for day, program_type, signups, renewals, expiring, diet, training, coach in daily_activity(starts[0], months[-1][2]):
+        row = report[bisect.bisect_right(starts, day) - 1]
+        kind = 'vip' if program_type == 'vip' else 'normal'
+        row[f'signups_{kind}'] += signups
+        row[f'renewals_{kind}'] += renewals
+        row['churned' if day < today else 'due'] += expiring
+        row['diet'] += diet
+        row['training'] += training
+        row['coach'] += coach
+    for row in report:
+        renewals = row['renewals_normal'] + row['renewals_vip']
+        row['retention'] = renewals / (renewals + row['churned']) if renewals + row['churned'] else None
+    return report
+
+def is_subscription_active(expiration_date):
+    exp_date = datetime.fromisoformat(expiration_date)
+    return datetime.now() < exp_date
+
+JALALI_CACHE_SIZE = 4096
+# The shared day table never grows past this many days (about two centuries),
+# and one batch may add at most this many days per distinct date it converts;
+# dates outside the table are converted one by one through _jalali_day().
+JALALI_TABLE_MAX_DAYS = 73050
+JALALI_TABLE_GROWTH_PER_DAY = 30
+
+@lru_cache(maxsize=JALALI_CACHE_SIZE)
+def _jalali_day(day):
+    from jdatetime import datetime as jdatetime
+    jdt = jdatetime.fromgregorian(datetime=datetime.fromisoformat(day))
+    return jdt.strftime('%Y/%m/%d')
+
+@timed('date.to_jalali')
+def to_jalali(iso_date):
+    # Only the calendar day matters for the result, so the cache is keyed on the
+    # YYYY-MM-DD prefix and shared by every timestamp that falls on that day.
+    return _jalali_day(iso_date[:10])
+
+def _jalali_month_length(year, month):
+    if month <= 6:
+        return 31
+    if month <= 11:
+        return 30
+    from jdatetime import date
+    return 30 if date(year, 1, 1).isleap() else 29
+
+def jalali_day_table(first_ordinal, last_ordinal):
+    """Jalali 'YYYY/MM/DD' strings for consecutive Gregorian day ordinals.
+
+    Only the first day goes through jdatetime; the rest are produced by stepping
+    the Jalali calendar forward one day at a time.
+    """
+    from jdatetime import datetime as jdatetime
+    start = jdatetime.fromgregorian(datetime=datetime.fromordinal(first_ordinal))
+    year, month, day = start.year, start.month, start.day
+    month_length = _jalali_month_length(year, month)
+    table = []
+    for _ in range(first_ordinal, last_ordinal + 1):
+        table.append(f"{year:04d}/{month:02d}/{day:02d}")
+        day += 1
+        if day > month_length:
+            day = 1
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+            month_length = _jalali_month_length(year, month)
+    return table
+
+def jalali_month_days(ordinal):
+    """First and last Gregorian day ordinals of the Jalali month containing ordinal."""
+    year, month, day = map(int, _jalali_day(datetime.fromordinal(ordinal).date().isoformat()).split('/'))
+    first = ordinal - day + 1
+    return first, first + _jalali_month_length(year, month) - 1
+
+def jalali_year_months(year):
+    """(month, first, last) Gregorian day ordinals for the twelve months of a Jalali year."""
+    from jdatetime import date
+    first = date(year, 1, 1).togregorian().toordinal()
+    months = []
+    for month in range(1, 13):
+        last = first + _jalali_month_length(year, month) - 1
+        months.append((month, first, last))
+        first = last + 1
+    return months
+
+def jalali_year(ordinal):
+    return int(_jalali_day(datetime.fromordinal(ordinal).date().isoformat())[:4])
+
+# Jalali strings keyed by ISO day for the consecutive ordinals from
+# _jalali_table_first to _jalali_table_last, shared by every to_jalali_batch()
+# call and extended at either end on demand
+_jalali_table = {}
+_jalali_table_first = _jalali_table_last = None
+_jalali_table_lock = threading.Lock()
+
+def _add_jalali_days(first_ordinal, last_ordinal):
+    for ordinal, jalali in zip(range(first_ordinal, last_ordinal + 1), jalali_day_table(first_ordinal, last_ordinal)):
+        _jalali_table[date.fromordinal(ordinal).isoformat()] = jalali
+
+def _grow_jalali_table(first, last, distinct_days):
+    global _jalali_table_first, _jalali_table_last
+    low, high = first, last
+    if _jalali_table_first is not None:
+        low, high = min(low, _jalali_table_first), max(high, _jalali_table_last)
+    growth = high - low + 1 - len(_jalali_table)
+    if growth > JALALI_TABLE_GROWTH_PER_DAY * distinct_days or high - low >= JALALI_TABLE_MAX_DAYS:
+        return
+    if _jalali_table_first is None:
+        _add_jalali_days(low, high)
+    else:
+        if high > _jalali_table_last:
+            _add_jalali_days(_jalali_table_last + 1, high)
+        if low < _jalali_table_first:
+            _add_jalali_days(low, _jalali_table_first - 1)
+    _jalali_table_first, _jalali_table_last = low, high
+
+@timed('date.to_jalali_batch')
+def to_jalali_batch(iso_dates):
+    """Convert a whole column of ISO dates to Jalali strings in one call."""
+    days = [iso_date[:10] for iso_date in iso_dates]
+    table = _jalali_table
+    missing = {day for day in days if day not in table}
+    if missing:
+        ordinals = [date.fromisoformat(day).toordinal() for day in missing]
+        with _jalali_table_lock:
+            _grow_jalali_table(min(ordinals), max(ordinals), len(missing))
+    # Days the table was not grown to cover go through the memoized converter
+    return [table.get(day) or _jalali_day(day) for day in days]
+
+def get_current_jalali_date_time():
+    from jdatetime import datetime as jdatetime
+    now = datetime.now()
+    jnow = jdatetime.fromgregorian(datetime=now)
+    persian_days = {
+        'Saturday': 'شنبه',
+        'Sunday': 'یکشنبه',
+        'Monday': 'دوشنبه',
+        'Tuesday': 'سه‌شنبه',
+        'Wednesday': 'چهارشنبه',
+        'Thursday': 'پنجشنبه',
+        'Friday': 'جمعه'
+    }
+    weekday_eng = jnow.strftime('%A')
+    weekday = persian_days.get(weekday_eng, weekday_eng)
+    date_str = jnow.strftime('%Y/%m/%d')
+    time_str = now.strftime('%H:%M:%S')
+    return f"{weekday} - {date_str} - {time_str}"
@@ -0,0 +1,145 @@
+"""Lightweight timing hooks for the hot paths of the app.
+
+Functions wrapped with @timed and blocks wrapped in measure() record call
+counts and latency histograms while instrumentation is enabled. When it is
+disabled the wrapper costs one flag check. Set GYM_PERF=1 to enable it at
+startup, or GYM_PERF_FILE=path to enable it and write a JSON snapshot to that
+path when the process exits.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with fixed millisecond buckets."""
+
+    BOUNDS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zero()
+
+    def clear(self):
+        with self._lock:
+            self._zero()
+
+    def _zero(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        index = bisect_left(self.BOUNDS_MS, ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        with self._lock:
+            if not self.total:
+                return 0.0
+            threshold = fraction * self.total
+            seen = 0
+            for bound, count in zip(self.BOUNDS_MS, self.counts):
+                seen += count
+                if seen >= threshold:
+                    return min(bound, self.max_ms)
+            return self.max_ms
+
+    def summary(self):
+        with self._lock:
+            labels = [f"<={bound}ms" for bound in self.BOUNDS_MS] + [f">{self.BOUNDS_MS[-1]}ms"]
+            return {
+                'count': self.total,
+                'mean_ms': self.sum_ms / self.total if self.total else 0.0,
+                'max_ms': self.max_ms,
+                'buckets': dict(zip(labels, self.counts)),
+            }
+
+_enabled = os.environ.get('GYM_PERF') == '1' or bool(os.environ.get('GYM_PERF_FILE'))
+_histograms = {}
+_registry_lock = threading.Lock()
+
+def is_enabled():
+    return _enabled
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+def histogram(name):
+    metric = _histograms.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _histograms.setdefault(name, LatencyHistogram())
+    return metric
+
+def timed(name):
+    """Decorator recording the wrapped function's latency under name while enabled."""
+    def decorator(func):
+        metric = None
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal metric
+            if not _enabled:
+                return func(*args, **kwargs)
+            if metric is None:
+                metric = histogram(name)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.record(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+@contextmanager
+def measure(name):
+    """Record the latency of a with-block under name while enabled."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram(name).record(time.perf_counter() - start)
+
+def snapshot():
+    with _registry_lock:
+        metrics = dict(_histograms)
+    return {
+        name: dict(metrics[name].summary(), p95_ms=metrics[name].percentile(0.95))
+        for name in sorted(metrics)
+    }
+
+def reset():
+    # Histograms are cleared in place because callers keep references to them.
+    with _registry_lock:
+        metrics = list(_histograms.values())
+    for metric in metrics:
+        metric.clear()
+
+def export(path):
+    """Write every recorded metric to path as JSON for offline analysis."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'exported': datetime.now().isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'metrics': snapshot(),
+        }, f, indent=2)
+
+if os.environ.get('GYM_PERF_FILE'):
+    atexit.register(export, os.environ['GYM_PERF_FILE'])
@@ -0,0 +1,444 @@
+"""Local HTTP/JSON service that lets several front-desk PCs share one database.
+
+One process owns gym_management.db and serves the UserRepository methods.
+Every PC runs gym.py or gym_cli.py against it in client mode:
+
+    python gym_server.py --host 0.0.0.0 --port 8765
+    GYM_SERVER=http://192.168.1.10:8765 python gym.py
+    python gym_cli.py --server http://192.168.1.10:8765 stats
+
+Reads run concurrently on a pool of threads, each with its own connection.
+Writes go through a queue to a single writer thread. Whatever writes have
+queued up while the previous batch ran are committed together in one
+transaction. Each write has its own savepoint, so a failing write is rolled
+back and reported to its caller without affecting the rest of the batch.
+
+Requests are POST /call/<method> with a JSON body {"args": [...]} and are
+answered with {"result": ...} or {"error": {"type": ..., "message": ...}}.
+GET /health reports that the server is up. There is no authentication, so
+only expose the server on the gym's private network.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import gym_core
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024 * 1024
+READ_METHODS = {
+    'get_all_users', 'get_user_stats', 'search_users', 'fetch_users_page', 'fetch_users_by_expiration',
+    'list_users', 'get_user_by_id', 'find_user_by_phone', 'registered_phones', 'member_status', 'member_visits', 'daily_visits', 'hourly_visits',
+    'get_users_by_ids', 'latest_change', 'get_changes_since', 'daily_activity',
+    'next_expiration',
+}
+WRITE_METHODS = {
+    'add_user', 'insert_users', 'update_user', 'update_user_fields', 'delete_user', 'renew_subscription', 'expire_lapsed_users',
+    'record_attendance', 'renormalize_phones', 'prune_changes', 'rebuild_analytics',
+}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 409: 'Conflict', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+class RemoteError(RuntimeError):
+    """An error raised by the server that has no local exception type."""
+
+class UnknownMethod(Exception):
+    """A call names a method the server does not expose."""
+
+# Exceptions that are re-raised with their own type on the client
+ERROR_TYPES = {
+    'ValueError': ValueError,
+    'TypeError': TypeError,
+    'IntegrityError': sqlite3.IntegrityError,
+    'OperationalError': sqlite3.OperationalError,
+}
+
+def error_status(exc):
+    if isinstance(exc, sqlite3.IntegrityError):
+        return 409
+    if isinstance(exc, (TypeError, ValueError)):
+        return 400
+    return 500
+
+def decode_args(name, args):
+    # datetimes travel as ISO strings
+    if name == 'expire_lapsed_users' and args and args[0]:
+        return [datetime.fromisoformat(args[0])] + list(args[1:])
+    return args
+
+class GymServer:
+    """Serves a UserRepository over HTTP with concurrent readers and one batching writer."""
+
+    def __init__(self, repository, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=4, max_batch=500):
+        self.repository = repository
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.batches = 0
+        self.batched_writes = 0
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='gym-reader')
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='gym-writer')
+        self._writes = None
+        self._handlers = set()
+        self._server = None
+        self._loop = None
+        self._thread = None
+
+    async def start(self):
+        """Bind the socket and start the writer task; returns the bound (host, port)."""
+        self._loop = asyncio.get_running_loop()
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._write_batches())
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self.host, self.port
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self):
+        """Run the server on its own event loop in a daemon thread; returns the bound (host, port)."""
+        started = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self._shutdown())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name='gym-server', daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.host, self.port
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+        self._readers.shutdown()
+        self._writer.shutdown()
+
+    async def _shutdown(self):
+        self._server.close()
+        await self._server.wait_closed()
+        # Closing the transports ends each handler at its next read, after any
+        # call it is waiting on has been answered
+        handlers = list(self._handlers)
+        for _, writer in handlers:
+            writer.close()
+        await asyncio.gather(*(task for task, _ in handlers), return_exceptions=True)
+        self._writer_task.cancel()
+        await asyncio.gather(self._writer_task, return_exceptions=True)
+
+    async def _write_batches(self):
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < self.max_batch and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                outcomes = await self._loop.run_in_executor(self._writer, self._apply_writes, batch)
+            except Exception as exc:
+                outcomes = [(False, exc)] * len(batch)
+            self.batches += 1
+            self.batched_writes += len(batch)
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply_writes(self, batch):
+        """Run a batch of writes in one transaction, each inside its own savepoint."""
+        outcomes = []
+        with self.repository.transaction() as conn:
+            for name, args, _ in batch:
+                conn.execute('SAVEPOINT write')
+                try:
+                    outcomes.append((True, getattr(self.repository, name)(*args)))
+                except Exception as exc:
+                    conn.execute('ROLLBACK TO write')
+                    outcomes.append((False, exc))
+                conn.execute('RELEASE write')
+        return outcomes
+
+    async def call(self, name, args):
+        args = decode_args(name, args)
+        if name in WRITE_METHODS:
+            future = self._loop.create_future()
+            await self._writes.put((name, args, future))
+            return await future
+        if name in READ_METHODS:
+            return await self._loop.run_in_executor(self._readers, getattr(self.repository, name), *args)
+        if name == 'data_version':
+            # PRAGMA data_version is per connection, so always ask the writer's
+            return await self._loop.run_in_executor(self._writer, self.repository.data_version)
+        raise UnknownMethod(name)
+
+    async def _dispatch(self, method, path, body):
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok', 'db': self.repository.db_name}
+        if method != 'POST' or not path.startswith('/call/'):
+            return 404, {'error': {'type': 'NotFound', 'message': path}}
+        name = path[len('/call/'):]
+        try:
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            args = request.get('args', [])
+            if not isinstance(args, list):
+                raise ValueError("args must be a list")
+            return 200, {'result': await self.call(name, args)}
+        except UnknownMethod:
+            return 404, {'error': {'type': 'NotFound', 'message': f"unknown method: {name}"}}
+        except Exception as exc:
+            return error_status(exc), {'error': {'type': type(exc).__name__, 'message': str(exc)}}
+
+    async def _handle(self, reader, writer):
+        handler = (asyncio.current_task(), writer)
+        self._handlers.add(handler)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {'error': {'type': 'PayloadTooLarge', 'message': f"{length} bytes"}}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    status, payload = await self._dispatch(method, path, body)
+                    keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                data = json.dumps(payload, ensure_ascii=False).encode()
+                head = [f"HTTP/1.1 {status} {REASONS[status]}", 'Content-Type: application/json; charset=utf-8',
+                        f"Content-Length: {len(data)}"]
+                if not keep_alive:
+                    head.append('Connection: close')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+class RemoteRepository:
+    """Stand-in for UserRepository that forwards every call to a GymServer.
+
+    Install it with gym_core.set_repository() and the module-level data
+    functions, and everything built on them, go through the server. Each
+    thread keeps one HTTP connection open.
+    """
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.timeout = timeout
+        self.db_name = url
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _request(self, method, path, body=None):
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body, {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                return response.status, json.loads(response.read())
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # A kept-alive connection to a restarted server; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def call(self, name, *args):
+        status, payload = self._request('POST', f'/call/{name}', json.dumps({'args': args}).encode())
+        if status != 200:
+            error = payload.get('error', {})
+            raise ERROR_TYPES.get(error.get('type'), RemoteError)(error.get('message', f"HTTP {status}"))
+        return payload['result']
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def init_schema(self):
+        # The server migrates its database at startup; just check it is reachable
+        status, payload = self._request('GET', '/health')
+        if status != 200:
+            raise RemoteError(f"{self.url} is not a gym server")
+
+    @contextmanager
+    def interruptible(self, should_cancel, every=1000):
+        # Remote calls cannot be interrupted; callers discard stale results instead
+        yield None
+
+    def add_user(self, name, phone, program_type, diet, training, coach, active=True):
+        return self.call('add_user', name, phone, program_type, diet, training, coach, active)
+
+    def insert_users(self, rows):
+        self.call('insert_users', [list(row) for row in rows])
+
+    def iter_users(self, chunk_size=5000):
+        after_id = 0
+        while True:
+            chunk = self.fetch_users_page('', after_id, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+            after_id = chunk[-1][0]
+
+    def update_user(self, user_id, name, phone, program_type, diet, training, coach, active):
+        self.call('update_user', user_id, name, phone, program_type, diet, training, coach, active)
+
+    def update_user_fields(self, user_id, fields):
+        self.call('update_user_fields', user_id, fields)
+
+    def delete_user(self, user_id):
+        self.call('delete_user', user_id)
+
+    def get_all_users(self):
+        return [tuple(row) for row in self.call('get_all_users')]
+
+    def get_user_stats(self):
+        return tuple(self.call('get_user_stats'))
+
+    def search_users(self, query):
+        return [tuple(row) for row in self.call('search_users', query)]
+
+    def fetch_users_page(self, query='', after_id=0, limit=gym_core.PAGE_SIZE):
+        return [tuple(row) for row in self.call('fetch_users_page', query, after_id, limit)]
+
+    def fetch_users_by_expiration(self, query='', after=None, limit=gym_core.PAGE_SIZE):
+        return [tuple(row) for row in self.call('fetch_users_by_expiration', query, after, limit)]
+
+    def list_users(self, query='', order='id', cursor=None, limit=gym_core.PAGE_SIZE):
+        users, next_cursor = self.call('list_users', query, order, cursor, limit)
+        return [tuple(row) for row in users], next_cursor
+
+    def get_user_by_id(self, user_id):
+        user = self.call('get_user_by_id', user_id)
+        return tuple(user) if user is not None else None
+
+    def find_user_by_phone(self, phone):
+        user = self.call('find_user_by_phone', phone)
+        return tuple(user) if user is not None else None
+
+    def registered_phones(self, normalized_phones):
+        return set(self.call('registered_phones', list(normalized_phones)))
+
+    def get_users_by_ids(self, user_ids, query=''):
+        return [tuple(row) for row in self.call('get_users_by_ids', sorted(set(user_ids)), query)]
+
+    def latest_change(self):
+        return self.call('latest_change')
+
+    def get_changes_since(self, seq, limit=gym_core.CHANGE_BATCH_SIZE):
+        changes = self.call('get_changes_since', seq, limit)
+        return [tuple(change) for change in changes] if changes is not None else None
+
+    def prune_changes(self, keep=gym_core.CHANGE_LOG_KEEP):
+        return self.call('prune_changes', keep)
+
+    def renormalize_phones(self):
+        return self.call('renormalize_phones')
+
+    def expire_lapsed_users(self, now=None):
+        return self.call('expire_lapsed_users', now.isoformat() if now else None)
+
+    def next_expiration(self, now_ts):
+        return self.call('next_expiration', now_ts)
+
+    def data_version(self):
+        return tuple(self.call('data_version'))
+
+    def renew_subscription(self, user_id):
+        self.call('renew_subscription', user_id)
+
+    def member_status(self, user_id, now_ts):
+        return self.call('member_status', user_id, now_ts)
+
+    def record_attendance(self, events):
+        self.call('record_attendance', [list(event) for event in events])
+
+    def member_visits(self, user_id, first_day, last_day):
+        return self.call('member_visits', user_id, first_day, last_day)
+
+    def daily_visits(self, first_day, last_day):
+        return [tuple(row) for row in self.call('daily_visits', first_day, last_day)]
+
+    def hourly_visits(self, first_day, last_day):
+        return self.call('hourly_visits', first_day, last_day)
+
+    def daily_activity(self, first_day, last_day):
+        return [tuple(row) for row in self.call('daily_activity', first_day, last_day)]
+
+    def rebuild_analytics(self):
+        self.call('rebuild_analytics')
+
+def serve(db_name=gym_core.DB_NAME, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=4):
+    repository = gym_core.UserRepository(db_name)
+    gym_core.set_repository(repository)
+    gym_core.init_db()
+    server = GymServer(repository, host, port, readers)
+    print(f"serving {db_name} on http://{host}:{port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the gym database to other front-desk PCs.")
+    parser.add_argument('--db', default=gym_core.DB_NAME, help="database file (default: %(default)s)")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--readers', type=int, default=4, help="threads serving reads concurrently")
+    args = parser.parse_args(argv)
+    return serve(args.db, args.host, args.port, args.readers)
+
+if __name__ == '__main__':
+    sys.exit(main())